@@ -0,0 +1,261 @@
+#
+# A compact binary database of the api that can be memory-mapped and queried by name
+# without loading everything.  All integers are little-endian.
+#
+#   header     : MAGIC, VERSION, then (offset, count) of each table below
+#   strings    : each string is a u16 byte length followed by its utf8 bytes,
+#                strings are referenced by their offset in this table
+#   types      : TYPE_STRUCT records, one per distinct type expression
+#   members    : MEMBER_STRUCT records (name, type), the fields of structs and the
+#                args of functions and funcptr types
+#   symbols    : SYMBOL_STRUCT records, one per typedef/struct/constant/function/unicode name
+#   hash index : u32 slots of an open addressing table (linear probing) keyed on the
+#                FNV-1a hash of the symbol name, each slot holds a symbol index + 1 (0 is empty)
+#
+import json
+import mmap
+import struct
+
+MAGIC = b"WINAPIDB"
+VERSION = 1
+
+HEADER_STRUCT = struct.Struct("<8sI" + "II" * 5)
+TYPE_STRUCT = struct.Struct("<BBHIII")
+MEMBER_STRUCT = struct.Struct("<II")
+SYMBOL_STRUCT = struct.Struct("<BBHIIIIIq")
+SLOT_STRUCT = struct.Struct("<I")
+
+# TYPE_STRUCT fields: kind, const, (unused), a, b, c
+#   native/alias  : a = name string
+#   singleptr/arrayptr : a = subtype
+#   fixedlenarray : a = subtype, b = len
+#   funcptr       : a = return type, b = first member (args), c = arg count
+TYPE_KINDS = ("native", "alias", "singleptr", "arrayptr", "fixedlenarray", "funcptr")
+TYPE_KIND_NUMS = {kind: num for num, kind in enumerate(TYPE_KINDS)}
+
+# SYMBOL_STRUCT fields: kind, flags, (unused), header string, name string, a, b, c, value
+#   typedef  : a = type
+#   struct   : b = first member (fields), c = field count
+#   constant : a = type, value = integer value or the string of a named value (FLAG_NAMED_VALUE)
+#   function : a = return type, b = first member (args), c = arg count
+#   unicode  : no extra fields
+SYMBOL_KINDS = ("typedef", "struct", "constant", "function", "unicode")
+SYMBOL_KIND_NUMS = {kind: num for num, kind in enumerate(SYMBOL_KINDS)}
+FLAG_NAMED_VALUE = 0x1
+FLAG_UNSIGNED_VALUE = 0x2
+
+def hashName(name_bytes):
+    hash = 0x811c9dc5
+    for b in name_bytes:
+        hash = ((hash ^ b) * 0x01000193) & 0xffffffff
+    return hash
+
+class Writer:
+    def __init__(self):
+        self.strings = bytearray()
+        self.string_offsets = {}
+        self.types = []
+        self.type_indices = {}
+        self.members = []
+        self.symbols = []
+
+    def addString(self, s):
+        offset = self.string_offsets.get(s)
+        if offset is None:
+            data = s.encode("utf8")
+            offset = len(self.strings)
+            self.strings += struct.pack("<H", len(data))
+            self.strings += data
+            self.string_offsets[s] = offset
+        return offset
+
+    def addMembers(self, members):
+        # adding the member types can add the members of nested funcptr types, so
+        # the records are only appended once all of them are resolved
+        records = [(self.addString(member["name"]), self.addType(member["type"])) for member in members]
+        start = len(self.members)
+        self.members.extend(records)
+        return start, len(records)
+
+    def addType(self, type):
+        key = json.dumps(type, sort_keys=True)
+        index = self.type_indices.get(key)
+        if index is not None:
+            return index
+        kind = type["kind"]
+        const, a, b, c = 0, 0, 0, 0
+        if kind == "native" or kind == "alias":
+            a = self.addString(type["name"])
+        elif kind == "singleptr" or kind == "arrayptr":
+            const = 1 if type["const"] else 0
+            a = self.addType(type["subtype"])
+        elif kind == "fixedlenarray":
+            a = self.addType(type["subtype"])
+            b = type["len"]
+        elif kind == "funcptr":
+            a = self.addType(type["return_type"])
+            b, c = self.addMembers(type["args"])
+        else:
+            raise Exception("unhandled type kind '{}'".format(kind))
+        index = len(self.types)
+        self.types.append((TYPE_KIND_NUMS[kind], const, 0, a, b, c))
+        self.type_indices[key] = index
+        return index
+
+    def addSymbol(self, kind, header, name, flags=0, a=0, b=0, c=0, value=0):
+        self.symbols.append((SYMBOL_KIND_NUMS[kind], flags, 0, self.addString(header), self.addString(name), a, b, c, value))
+
+    # adds the json data of one header (as written by json-gen)
+    def addHeader(self, header, jsondata):
+        for info in jsondata["types"]:
+            if info["kind"] == "typedef":
+                self.addSymbol("typedef", header, info["name"], a=self.addType(info["definition"]))
+            else:
+                b, c = self.addMembers(info["fields"])
+                self.addSymbol("struct", header, info["name"], b=b, c=c)
+        for info in jsondata["constants"]:
+            type = self.addType(info["type"])
+            value = info["value"]
+            if isinstance(value, str):
+                self.addSymbol("constant", header, info["name"], flags=FLAG_NAMED_VALUE, a=type, value=self.addString(value))
+            elif value > 0x7fffffffffffffff:
+                self.addSymbol("constant", header, info["name"], flags=FLAG_UNSIGNED_VALUE, a=type, value=value - (1 << 64))
+            else:
+                self.addSymbol("constant", header, info["name"], a=type, value=value)
+        for info in jsondata["functions"]:
+            return_type = self.addType(info["return_type"])
+            b, c = self.addMembers(info["args"])
+            self.addSymbol("function", header, info["name"], a=return_type, b=b, c=c)
+        for info in jsondata["unicode_names"]:
+            self.addSymbol("unicode", header, info["name"])
+
+    def buildHashIndex(self):
+        slot_count = 1
+        while slot_count < 2 * len(self.symbols):
+            slot_count *= 2
+        mask = slot_count - 1
+        slots = [0] * slot_count
+        for index, symbol in enumerate(self.symbols):
+            name_offset = symbol[4]
+            length, = struct.unpack_from("<H", self.strings, name_offset)
+            slot = hashName(self.strings[name_offset + 2:name_offset + 2 + length]) & mask
+            while slots[slot]:
+                slot = (slot + 1) & mask
+            slots[slot] = index + 1
+        return slots
+
+    def write(self, out_file):
+        slots = self.buildHashIndex()
+        tables = (
+            (b"".join(TYPE_STRUCT.pack(*t) for t in self.types), len(self.types)),
+            (b"".join(MEMBER_STRUCT.pack(*m) for m in self.members), len(self.members)),
+            (b"".join(SYMBOL_STRUCT.pack(*s) for s in self.symbols), len(self.symbols)),
+            (b"".join(SLOT_STRUCT.pack(s) for s in slots), len(slots)),
+        )
+        offset = HEADER_STRUCT.size
+        header_fields = [MAGIC, VERSION, offset, len(self.strings)]
+        offset += len(self.strings)
+        for data, count in tables:
+            header_fields += [offset, count]
+            offset += len(data)
+        out_file.write(HEADER_STRUCT.pack(*header_fields))
+        out_file.write(self.strings)
+        for data, _ in tables:
+            out_file.write(data)
+
+class FormatError(Exception):
+    pass
+
+class Database:
+    def __init__(self, filename):
+        with open(filename, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = HEADER_STRUCT.unpack_from(self.map, 0)
+        if fields[0] != MAGIC:
+            raise FormatError("{}: not an api database".format(filename))
+        if fields[1] != VERSION:
+            raise FormatError("{}: unsupported api database version {} (expected {})".format(filename, fields[1], VERSION))
+        self.strings_offset = fields[2]
+        self.types_offset = fields[4]
+        self.members_offset = fields[6]
+        self.symbols_offset = fields[8]
+        self.symbol_count = fields[9]
+        self.slots_offset = fields[10]
+        self.slot_mask = fields[11] - 1
+
+    def close(self):
+        self.map.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def getStringBytes(self, offset):
+        offset += self.strings_offset
+        length, = struct.unpack_from("<H", self.map, offset)
+        return self.map[offset + 2:offset + 2 + length]
+    def getString(self, offset):
+        return self.getStringBytes(offset).decode("utf8")
+
+    # returns the symbol with the given name in the same shape as the json-gen output,
+    # with "symbol_kind" and "header" added, or None if there is no such symbol
+    def lookup(self, name):
+        index = self.findSymbol(name)
+        if index is None:
+            return None
+        return self.decodeSymbol(index)
+
+    def findSymbol(self, name):
+        name_bytes = name.encode("utf8")
+        slot = hashName(name_bytes) & self.slot_mask
+        while True:
+            entry, = SLOT_STRUCT.unpack_from(self.map, self.slots_offset + slot * SLOT_STRUCT.size)
+            if entry == 0:
+                return None
+            name_offset, = struct.unpack_from("<I", self.map, self.symbols_offset + (entry - 1) * SYMBOL_STRUCT.size + 8)
+            if self.getStringBytes(name_offset) == name_bytes:
+                return entry - 1
+            slot = (slot + 1) & self.slot_mask
+
+    def iterSymbolNames(self):
+        for index in range(self.symbol_count):
+            name_offset, = struct.unpack_from("<I", self.map, self.symbols_offset + index * SYMBOL_STRUCT.size + 8)
+            yield self.getString(name_offset)
+
+    def decodeSymbol(self, index):
+        kind, flags, _, header, name, a, b, c, value = SYMBOL_STRUCT.unpack_from(self.map, self.symbols_offset + index * SYMBOL_STRUCT.size)
+        kind = SYMBOL_KINDS[kind]
+        data = {"symbol_kind":kind,"header":self.getString(header)}
+        if kind == "typedef":
+            data.update({"kind":"typedef","name":self.getString(name),"definition":self.decodeType(a)})
+        elif kind == "struct":
+            data.update({"kind":"struct","name":self.getString(name),"fields":self.decodeMembers(b, c)})
+        elif kind == "constant":
+            if flags & FLAG_NAMED_VALUE:
+                value = self.getString(value)
+            elif flags & FLAG_UNSIGNED_VALUE:
+                value += 1 << 64
+            data.update({"name":self.getString(name),"type":self.decodeType(a),"value":value})
+        elif kind == "function":
+            data.update({"name":self.getString(name),"return_type":self.decodeType(a),"args":self.decodeMembers(b, c)})
+        else:
+            data["name"] = self.getString(name)
+        return data
+
+    def decodeMembers(self, start, count):
+        members = []
+        for index in range(start, start + count):
+            name, type = MEMBER_STRUCT.unpack_from(self.map, self.members_offset + index * MEMBER_STRUCT.size)
+            members.append({"type":self.decodeType(type),"name":self.getString(name)})
+        return members
+
+    def decodeType(self, index):
+        kind, const, _, a, b, c = TYPE_STRUCT.unpack_from(self.map, self.types_offset + index * TYPE_STRUCT.size)
+        kind = TYPE_KINDS[kind]
+        if kind == "native" or kind == "alias":
+            return {"kind":kind,"name":self.getString(a)}
+        if kind == "singleptr" or kind == "arrayptr":
+            return {"kind":kind,"const":bool(const),"subtype":self.decodeType(a)}
+        if kind == "fixedlenarray":
+            return {"kind":kind,"len":b,"subtype":self.decodeType(a)}
+        return {"kind":kind,"return_type":self.decodeType(a),"args":self.decodeMembers(b, c)}
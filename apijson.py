@@ -0,0 +1,345 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+
+import stringreader
+import parse
+import nativetypes
+import manifest
+import symbols
+import layout
+import typeresolve
+import constfold
+import typepool
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# the modules that determine the json output, the generator version changes whenever one of them does
+GENERATOR_MODULES = ("apijson.py", "manifest.py", "symbols.py", "lex.py", "parse.py", "stringreader.py", "nativetypes.py",
+                     "layout.py", "typeresolve.py", "constfold.py", "typepool.py")
+
+def getGeneratorVersion():
+    return manifest.hashFiles([os.path.join(SCRIPT_DIR, module) for module in GENERATOR_MODULES])
+
+NATIVE_TYPE_MAP = {}
+for t in nativetypes.NATIVE_TYPES:
+    NATIVE_TYPE_MAP[t] = True
+
+def typeToJsonData(t):
+    if isinstance(t, parse.NamedType):
+        if t.name in NATIVE_TYPE_MAP:
+            return {"kind":"native","name":t.name}
+        return {"kind":"alias","name":t.name}
+    if isinstance(t, parse.SinglePtrType):
+        return {"kind":"singleptr","const":t.const, "subtype":typeToJsonData(t.sub_type)}
+    if isinstance(t, parse.ArrayPtrType):
+        return {"kind":"arrayptr","const":t.const,"subtype":typeToJsonData(t.sub_type)}
+    if isinstance(t, parse.FuncPtrType):
+        return {"kind":"funcptr","return_type":typeToJsonData(t.return_type),"args":[
+            {"name":arg.name,"type":typeToJsonData(arg.type)} for arg in t.args]}
+    if isinstance(t, parse.FixedLenArrayType):
+        return {"kind":"fixedlenarray","len":t.len,"subtype":typeToJsonData(t.sub_type)}
+    raise Exception("unhandled type class {}".format(type(t).__name__))
+
+def constValueToJsonData(val):
+    if isinstance(val, parse.Integer):
+        return val.int_value
+    if isinstance(val, parse.NamedValue):
+        return val.name
+    raise Exception("unhandled ConstValue class {}".format(type(val).__name__))
+
+# the sections of a json file, in the order they are written
+SECTIONS = ("includes", "types", "constants", "functions", "unicode_names")
+
+# returns the section the node belongs to and its json data
+def nodeToJsonData(node):
+    if isinstance(node, parse.TypedefNode):
+        return "types", {"kind":"typedef","name":node.name,"definition":typeToJsonData(node.def_type)}
+    if isinstance(node, parse.StructNode):
+        return "types", {"kind":"struct","name":node.name,
+                         "fields":[{"type":typeToJsonData(field.type),"name":field.name} for field in node.fields]}
+    if isinstance(node, parse.ConstNode):
+        return "constants", {"name":node.name,"type":typeToJsonData(node.type),"value":constValueToJsonData(node.value)}
+    if isinstance(node, parse.FuncNode):
+        return "functions", {"name":node.name,"return_type":typeToJsonData(node.return_type),
+                             "args":[{"type":typeToJsonData(arg.type),"name":arg.name} for arg in node.args]}
+    if isinstance(node, parse.UnicodeNode):
+        return "unicode_names", {"name":node.name}
+    if isinstance(node, parse.IncludeNode):
+        return "includes", {"filename":node.filename_no_ext}
+    raise Exception("unhandled node {}".format(type(node).__name__))
+
+def toJsonData(nodes):
+    jsondata = {section: [] for section in SECTIONS}
+    for node in nodes:
+        section, data = nodeToJsonData(node)
+        jsondata[section].append(data)
+    return jsondata
+
+# sections larger than this are spooled to disk by writeJsonStream
+SPOOL_MAX_SIZE = 1024 * 1024
+
+def getSectionSeparator(section):
+    return '], "{}": ['.format(section)
+
+def writePool(out_file, pool):
+    out_file.write(getSectionSeparator("type_pool"))
+    out_file.write(", ".join(json.dumps(entry) for entry in pool.entries))
+
+# writes the same text as json.dump(toJsonData(nodes), out_file) but converts each node
+# as soon as it is produced so neither the nodes nor the json data are held in memory.
+# The first section is written straight to out_file, the others are spooled until the
+# end of the input so the section order is kept.  With a typepool.Pool the compact
+# format is written, the types are added to the pool and it is written last.  Returns
+# the offset of the separator before each of the other sections (and the pool),
+# json.dumps only writes ascii so characters and bytes are the same.
+def writeJsonStream(nodes, out_file, convert=nodeToJsonData, pool=None):
+    spools = {section: tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+") for section in SECTIONS[1:]}
+    try:
+        outputs = dict(spools)
+        outputs[SECTIONS[0]] = out_file
+        prefixes = {section: "" for section in SECTIONS}
+        sizes = {section: 0 for section in SECTIONS}
+        header = '{{"{}": ['.format(SECTIONS[0])
+        out_file.write(header)
+        for node in nodes:
+            section, data = convert(node)
+            if pool is not None:
+                data = typepool.mapInfoTypes(section, data, pool.add)
+            output = outputs[section]
+            text = json.dumps(data)
+            output.write(prefixes[section])
+            output.write(text)
+            sizes[section] += len(prefixes[section]) + len(text)
+            prefixes[section] = ", "
+        offsets = {}
+        offset = len(header) + sizes[SECTIONS[0]]
+        for section in SECTIONS[1:]:
+            offsets[section] = offset
+            separator = getSectionSeparator(section)
+            out_file.write(separator)
+            spool = spools[section]
+            spool.seek(0)
+            shutil.copyfileobj(spool, out_file)
+            offset += len(separator) + sizes[section]
+        if pool is not None:
+            offsets["type_pool"] = offset
+            writePool(out_file, pool)
+        out_file.write("]}")
+        return offsets
+    finally:
+        for spool in spools.values():
+            spool.close()
+
+def getOutFilename(out_dir, filename):
+    return os.path.join(out_dir, os.path.basename(filename)[:-4] + ".json")
+
+# the sections of the json data that are linked, they follow the first section so
+# linking a file written by writeJsonStream only rewrites the text between them
+LINKED_SECTIONS = ("types", "constants")
+assert(LINKED_SECTIONS == SECTIONS[1:3])
+
+# a json file to link: the linked sections of its json data (in the normal format) and
+# the compact flag of the file.  For a file written by writeJsonStream span is the
+# (start, end) offsets of the linked sections and, for the compact format, pool is its
+# type pool and pool_offset where it starts; span is None if the whole file has to be
+# loaded to rewrite it
+class JsonFile:
+    def __init__(self, filename, sections, span, compact, pool=None, pool_offset=None):
+        self.filename = filename
+        self.sections = sections
+        self.span = span
+        self.compact = compact
+        self.pool = pool
+        self.pool_offset = pool_offset
+
+# returns the JsonFile of a json file written by an earlier run
+def loadJsonFile(filename):
+    with open(filename, "r") as file:
+        jsondata = json.load(file)
+    compact = typepool.isCompact(jsondata)
+    jsondata = typepool.expandJsonData(jsondata)
+    return JsonFile(filename, {section: jsondata[section] for section in LINKED_SECTIONS}, None, compact)
+
+# converts one .api file to json, this runs in the worker processes of json-gen
+# so it must not print and only raise picklable exceptions (i.e. lex.SyntaxError).
+# Returns the symbol records (see symbols.recordDefinitions) and the JsonFile of the
+# output, its linked sections are kept so linkFiles doesn't have to read them back.
+# compact writes the compact format of typepool.
+def processFile(out_dir, filename, lexer_class, compact=False, stats=None):
+    out_filename = getOutFilename(out_dir, filename)
+
+    start = time.perf_counter()
+    with open(filename) as file:
+        text = file.read()
+    read_seconds = time.perf_counter() - start
+
+    reader = stringreader.StringReader(text, filename)
+    lexer = lexer_class(reader)
+    parser = parse.Parser(lexer)
+    records = []
+    nodes = symbols.recordDefinitions(parser.iterDefinitions(), reader, records)
+    convert = nodeToJsonData
+    if stats is not None:
+        # lexing, parsing, converting and serializing are interleaved, each one is timed separately
+        lex_time = stats.instrumentLexer(lexer)
+        parse_time = stats.accumulator()
+        nodes = parse_time.iterate(nodes)
+        convert_time = stats.accumulator()
+        convert = convert_time.wrap(nodeToJsonData)
+    pool = typepool.Pool() if compact else None
+    sections = {section: [] for section in LINKED_SECTIONS}
+    def convertAndKeep(node):
+        section, data = convert(node)
+        if section in sections:
+            sections[section].append(data)
+        return section, data
+    start = time.perf_counter()
+    # written to a temporary file so a syntax error part way through doesn't leave a truncated output
+    tmp_filename = out_filename + ".tmp"
+    try:
+        with open(tmp_filename, "w") as out_file:
+            offsets = writeJsonStream(nodes, out_file, convertAndKeep, pool)
+    except:
+        os.remove(tmp_filename)
+        raise
+    os.replace(tmp_filename, out_filename)
+    if stats is not None:
+        stream_seconds = time.perf_counter() - start
+        stats.addTime("read", read_seconds, filename)
+        stats.addTime("lex", lex_time.seconds, filename)
+        stats.addTime("parse", parse_time.seconds - lex_time.seconds, filename)
+        stats.addTime("convert", convert_time.seconds, filename)
+        stats.addTime("serialize", stream_seconds - parse_time.seconds - convert_time.seconds, filename)
+        stats.count("files")
+        stats.count("input bytes", len(text))
+        stats.count("output bytes", os.path.getsize(out_filename))
+        stats.count("tokens", lex_time.calls)
+        stats.count("nodes", parse_time.calls)
+        for _, kind, _, _, _ in records:
+            stats.count("unicode names" if kind == "unicode" else kind + "s")
+    # from the separator before "types" to the one before "functions"
+    span = (offsets["types"], offsets["functions"])
+    return records, JsonFile(out_filename, sections, span, compact, pool, offsets.get("type_pool"))
+
+# returns (getLinks, errors) for the given json data (only the linked sections are used),
+# getLinks(info) returns the key and value that link a type or constant (the layout of a
+# struct, the resolved type of a typedef or the folded value of a named constant, None if
+# it has none) and errors are (name, message) of the ones that can't be linked
+def computeLinks(jsondatas):
+    definitions = layout.getDefinitions(jsondatas)
+    layouts, layout_errors = layout.computeLayouts(definitions)
+    resolved, resolve_errors = typeresolve.resolveTypedefs(definitions)
+    folded, fold_errors = constfold.foldConstants(constfold.getConstants(jsondatas))
+    def getLinks(info):
+        if "value" in info:
+            return "folded", folded.get(info["name"])
+        if info["kind"] == "struct":
+            return "layout", layouts.get(info["name"])
+        return "resolved", resolved.get(info["name"])
+    return getLinks, resolve_errors + layout_errors + fold_errors
+
+def isLinked(jsondata, getLinks):
+    for section in LINKED_SECTIONS:
+        for info in jsondata[section]:
+            key, value = getLinks(info)
+            if info.get(key) != value:
+                return False
+    return True
+
+def setLinks(jsondata, getLinks):
+    for section in LINKED_SECTIONS:
+        for info in jsondata[section]:
+            key, value = getLinks(info)
+            info.pop(key, None)
+            if value is not None:
+                info[key] = value
+
+# rewrites the linked sections of a file written by writeJsonStream, the text before and
+# after them is copied as is.  In the compact format the types of the links are added to
+# the pool, which is rewritten too.
+def writeLinkedSections(json_file):
+    start, end = json_file.span
+    pool = json_file.pool
+    tmp_filename = json_file.filename + ".tmp"
+    with open(json_file.filename, "rb") as old_file, open(tmp_filename, "w", newline="") as new_file:
+        new_file.write(old_file.read(start).decode("ascii"))
+        for section in LINKED_SECTIONS:
+            infos = json_file.sections[section]
+            if pool is not None:
+                infos = [typepool.mapInfoTypes(section, info, pool.add) for info in infos]
+            new_file.write(getSectionSeparator(section))
+            new_file.write(", ".join(json.dumps(info) for info in infos))
+        old_file.seek(end)
+        if pool is None:
+            new_file.write(old_file.read().decode("ascii"))
+        else:
+            new_file.write(old_file.read(json_file.pool_offset - end).decode("ascii"))
+            writePool(new_file, pool)
+            new_file.write("]}")
+    os.replace(tmp_filename, json_file.filename)
+
+# rewrites a whole json file with its linked sections, in the compact format if compact is set
+def writeLinkedFile(json_file, compact):
+    with open(json_file.filename, "r") as file:
+        jsondata = typepool.load(file)
+    jsondata.update(json_file.sections)
+    if compact:
+        jsondata = typepool.compactJsonData(jsondata)
+    tmp_filename = json_file.filename + ".tmp"
+    with open(tmp_filename, "w") as file:
+        file.write(json.dumps(jsondata))
+    os.replace(tmp_filename, json_file.filename)
+
+# adds the layout of each struct, the resolved type of each typedef and the folded value
+# of each named constant to the json files (JsonFile objects), which needs every header so
+# it runs once all of them are generated.  The links are computed from the sections of the
+# JsonFiles and only the files whose links changed (or that aren't in the requested format,
+# see typepool) are rewritten.  Returns (name, message) of the types and constants that
+# can't be linked
+def linkFiles(json_files, compact=False):
+    getLinks, errors = computeLinks([json_file.sections for json_file in json_files])
+    for json_file in json_files:
+        if json_file.compact == compact and isLinked(json_file.sections, getLinks):
+            continue
+        setLinks(json_file.sections, getLinks)
+        if json_file.span is not None and json_file.compact == compact:
+            writeLinkedSections(json_file)
+        else:
+            writeLinkedFile(json_file, compact)
+    return errors
+
+# the in memory version of linkFiles, links the json data of every header in place and
+# appends the json data whose links changed to modified if it's given
+def linkJsonData(jsondatas, modified=None):
+    getLinks, errors = computeLinks(jsondatas)
+    for jsondata in jsondatas:
+        if modified is not None:
+            if isLinked(jsondata, getLinks):
+                continue
+            modified.append(jsondata)
+        setLinks(jsondata, getLinks)
+    return errors
+
+# parses one .api file into json data without writing anything, returns the json data
+# and the symbol records (see symbols.recordDefinitions)
+def parseFile(filename, lexer_class):
+    with open(filename) as file:
+        text = file.read()
+    reader = stringreader.StringReader(text, filename)
+    parser = parse.Parser(lexer_class(reader))
+    records = []
+    jsondata = toJsonData(symbols.recordDefinitions(parser.iterDefinitions(), reader, records))
+    return jsondata, records
+
+# parses one .api file without generating anything, returns the messages of every syntax error
+def checkFile(filename, lexer_class):
+    with open(filename) as file:
+        text = file.read()
+    parser = parse.Parser(lexer_class(stringreader.StringReader(text, filename)))
+    nodes = []
+    errors = []
+    parser.parseIntoCollectingErrors(nodes, errors)
+    return [str(err) for err in errors]
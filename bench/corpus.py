@@ -0,0 +1,129 @@
+import os
+import random
+
+BASE_TYPES = (
+    "int",
+    "unsigned",
+    "uint8_t",
+    "uint16_t",
+    "uint32_t",
+    "uint64_t",
+    "size_t",
+    "int32_t",
+    "int64_t",
+    "char",
+    "wchar_t",
+)
+
+ARG_NAMES = ("hwnd", "uMsg", "wParam", "lParam", "dwFlags", "lpBuffer", "nSize", "hInstance")
+
+# the kinds of declarations generateFile writes and their default weights
+DEFAULT_MIX = {"typedef": 2, "struct": 2, "funcptr": 1, "function": 6, "const": 2, "unicode": 1}
+
+# returns the number of declarations of the default mix that hold about function_count functions
+def getDeclsForFunctions(function_count):
+    return function_count * sum(DEFAULT_MIX.values()) // DEFAULT_MIX["function"]
+
+# parses a mix like "function=4,struct=1", kinds that aren't given get a weight of 0
+def parseMix(text):
+    mix = dict.fromkeys(DEFAULT_MIX, 0)
+    for item in text.split(","):
+        kind, _, weight = item.partition("=")
+        if kind not in mix:
+            raise ValueError("unknown declaration kind '{}', expected one of {}".format(kind, ", ".join(DEFAULT_MIX)))
+        mix[kind] = int(weight) if weight else 1
+    if not any(mix.values()):
+        raise ValueError("the mix '{}' has no declarations".format(text))
+    return mix
+
+# generates the text of a .api file with decl_count declarations picked by the weights
+# of mix (see DEFAULT_MIX).  Every name starts with prefix so files don't conflict,
+# includes are the names of the files to @include and extern_types the types they
+# define, which the declarations use like their own.  Returns the text and the names
+# of the types it defines, the same arguments always produce the same text.
+def generateFile(decl_count, mix=None, seed=0, prefix="", includes=(), extern_types=()):
+    rand = random.Random(seed)
+    kinds = [kind for kind, weight in (mix or DEFAULT_MIX).items() if weight > 0]
+    weights = [(mix or DEFAULT_MIX)[kind] for kind in kinds]
+    lines = ['@include "{}.h"'.format(include) for include in includes]
+    type_names = list(BASE_TYPES) + list(extern_types)
+    defined_types = []
+    const_names = []
+    def randomType():
+        name = rand.choice(type_names)
+        mod = rand.random()
+        if mod < 0.2:
+            return name + "*"
+        if mod < 0.3:
+            return "const " + name + "*"
+        if mod < 0.35:
+            return name + "[*]"
+        return name
+    # numbered so the generated C compiles
+    def randomArgs():
+        return ", ".join("{} {}{}".format(randomType(), rand.choice(ARG_NAMES), j) for j in range(rand.randint(0, 6)))
+    def randomFields():
+        fields = []
+        for f in range(rand.randint(1, 6)):
+            if rand.random() < 0.1:
+                fields.append(" {}[{}] f{};".format(rand.choice(type_names), rand.randint(2, 64), f))
+            else:
+                fields.append(" {} f{};".format(randomType(), f))
+        return "".join(fields)
+    def addType(name):
+        type_names.append(name)
+        defined_types.append(name)
+
+    for i, kind in enumerate(rand.choices(kinds, weights, k=decl_count)):
+        name = "{}{}{}".format(prefix, kind.upper(), i)
+        if kind == "typedef":
+            lines.append("typedef {} {};".format(randomType(), name))
+            addType(name)
+        elif kind == "struct":
+            lines.append("struct {} {{{} }}".format(name, randomFields()))
+            addType(name)
+        elif kind == "funcptr":
+            lines.append("typedef funcptr {}({}) {};".format(rand.choice(("void", randomType())), randomArgs(), name))
+            addType(name)
+        elif kind == "function":
+            lines.append("{} {}({});".format(rand.choice(("void", randomType())), name, randomArgs()))
+        elif kind == "const":
+            if const_names and rand.random() < 0.2:
+                # a named value refers to an earlier constant
+                lines.append("void {} = {};".format(name, rand.choice(const_names)))
+            else:
+                lines.append("{} {} = 0x{:X};".format(rand.choice(("void", "uint32_t", "int")), name, rand.randint(0, 0xffff)))
+            const_names.append(name)
+        elif rand.random() < 0.75:
+            args = randomArgs()
+            lines.append("int {}A({});".format(name, args))
+            lines.append("int {}W({});".format(name, args))
+            lines.append("@unicode {};".format(name))
+        else:
+            fields = randomFields()
+            lines.append("struct {}A {{{} }}".format(name, fields))
+            lines.append("struct {}W {{{} }}".format(name, fields))
+            lines.append("@unicode {};".format(name))
+            addType(name + "A")
+            addType(name + "W")
+    lines.append("")
+    return "\n".join(lines), defined_types
+
+# writes files .api files of decls_per_file declarations each to api_dir, each file
+# @includes up to max_includes of the files before it and uses their types.  Returns
+# the total number of declarations and bytes written.
+def generateCorpus(api_dir, files, decls_per_file, mix=None, seed=0, max_includes=2):
+    rand = random.Random(seed)
+    file_types = []
+    total_bytes = 0
+    for i in range(files):
+        includes = sorted(rand.sample(range(i), min(i, rand.randint(0, max_includes))))
+        extern_types = [name for include in includes for name in file_types[include]]
+        text, defined_types = generateFile(decls_per_file, mix, seed=seed * 100003 + i, prefix="F{}_".format(i),
+                                           includes=["synthetic{}".format(include) for include in includes],
+                                           extern_types=extern_types)
+        file_types.append(defined_types)
+        with open(os.path.join(api_dir, "synthetic{}.api".format(i)), "w") as file:
+            file.write(text)
+        total_bytes += len(text)
+    return files * decls_per_file, total_bytes
@@ -0,0 +1,417 @@
+#
+# Generates C headers from the json data of json-gen, used by c-header-gen on the
+# files in out/json and by gen on the json data it parsed in the same process.
+#
+import io
+import os
+import re
+import sys
+
+import manifest
+import symbols
+import typeresolve
+import typepool
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# the files that determine the headers, the generator version changes whenever one of them does
+GENERATOR_FILES = ("c-header-gen", "cheader.py", "typeresolve.py", "typepool.py")
+
+def getGeneratorVersion():
+    return manifest.hashFiles([os.path.join(SCRIPT_DIR, filename) for filename in GENERATOR_FILES])
+
+class Header:
+    def __init__(self, name, json_filename, header_filename, jsondata, type_refs, type_exports):
+        self.name = name
+        self.json_filename = json_filename
+        self.header_filename = header_filename
+        # jsondata is None for unchanged headers in incremental mode until loadJson is called
+        self.jsondata = jsondata
+        self.type_refs = type_refs
+        self.type_exports = type_exports
+        self.imports = {}
+    def loadJson(self):
+        if self.jsondata is None:
+            with open(self.json_filename, "r") as file:
+                self.jsondata = typepool.load(file)
+
+# given a type from the json data, return the type name reference if there is one and it is not native
+def addTypeRefs(type_refs, type):
+    kind = type["kind"]
+    if kind == "native":
+        return
+    if kind == "alias":
+        type_refs[type["name"]] = True
+    if kind == "singleptr" or kind == "arrayptr":
+        return addTypeRefs(type_refs, type["subtype"])
+
+def analyzeJson(json_filename):
+    with open(json_filename, "r") as file:
+        jsondata = typepool.load(file)
+    type_refs, type_exports = analyzeJsonData(jsondata)
+    return jsondata, type_refs, type_exports
+
+# returns the (type_refs, type_exports) of a header's json data
+def analyzeJsonData(jsondata):
+    type_refs = {}
+    type_exports = {}
+    #
+    # find type_refs
+    #
+    for info in jsondata["constants"]:
+        addTypeRefs(type_refs, info["type"])
+    for info in jsondata["types"]:
+        type_exports[info["name"]] = info["kind"]
+        kind = info["kind"]
+        if kind == "typedef":
+            addTypeRefs(type_refs, info["definition"])
+        elif kind == "struct":
+            for field in info["fields"]:
+                addTypeRefs(type_refs, field["type"])
+        else:
+            assert(False)
+    for info in jsondata["functions"]:
+        addTypeRefs(type_refs, info["return_type"])
+        for arg in info["args"]:
+            addTypeRefs(type_refs, arg["type"])
+    return type_refs, type_exports
+
+def isVoid(type):
+    return type["kind"] == "native" and type["name"] == "void"
+
+# canonical type key -> (prefix, suffix, name_inside)
+TYPE_SPELLINGS = {}
+
+# Returns the C spelling of a type as (prefix, suffix, name_inside).  Some types must
+# write the name within the type (i.e. function pointers), for those name_inside is
+# True and a declaration is prefix + name + suffix, otherwise it's prefix + suffix + " " + name.
+# Spellings are memoized since the same types appear over and over again.
+def getTypeSpelling(type):
+    key = typeresolve.getTypeKey(type)
+    spelling = TYPE_SPELLINGS.get(key)
+    if spelling is None:
+        spelling = TYPE_SPELLINGS[key] = createTypeSpelling(type)
+    return spelling
+
+def createTypeSpelling(type):
+    kind = type["kind"]
+    if kind == "native" or kind == "alias":
+        return type["name"], "", False
+    if kind == "singleptr" or kind == "arrayptr":
+        prefix, suffix, name_inside = getTypeSpelling(type["subtype"])
+        if type["const"]:
+            prefix = "const " + prefix
+        return prefix, suffix + "*", name_inside
+    if kind == "funcptr":
+        args = ", ".join(typeRefAndName(arg["type"], arg["name"]) for arg in type["args"])
+        return typeRefNoName(type["return_type"]) + "(*", ")(" + args + ")", True
+    if kind == "fixedlenarray":
+        prefix, suffix, name_inside = getTypeSpelling(type["subtype"])
+        if name_inside:
+            return prefix, "{}[{}]".format(suffix, type["len"]), True
+        return prefix + suffix + " ", "[{}]".format(type["len"]), True
+    assert(False)
+
+# names and pointers to names are cheaper to spell than to look up, only the other types use the memo
+def typeRefAndName(type, name):
+    kind = type["kind"]
+    if kind == "native" or kind == "alias":
+        return type["name"] + " " + name
+    if kind == "singleptr" or kind == "arrayptr":
+        subtype = type["subtype"]
+        sub_kind = subtype["kind"]
+        if sub_kind == "native" or sub_kind == "alias":
+            return ("const " if type["const"] else "") + subtype["name"] + "* " + name
+    prefix, suffix, name_inside = getTypeSpelling(type)
+    if name_inside:
+        return prefix + name + suffix
+    return prefix + suffix + " " + name
+
+def typeRefNoName(type):
+    kind = type["kind"]
+    if kind == "native" or kind == "alias":
+        return type["name"]
+    if kind == "singleptr" or kind == "arrayptr":
+        subtype = type["subtype"]
+        sub_kind = subtype["kind"]
+        if sub_kind == "native" or sub_kind == "alias":
+            return ("const " if type["const"] else "") + subtype["name"] + "*"
+    prefix, suffix, _ = getTypeSpelling(type)
+    return prefix + suffix
+
+FUNCTION_TEMPLATE = "{} {}({}\n);\n"
+FIELD_TEMPLATE = "    {};\n"
+
+NAME_KIND_TYPE = 1
+NAME_KIND_FUNC = 2
+
+def writePreamble(out_file):
+    out_file.write('#include <stdint.h>\n')
+    out_file.write('#include <wchar.h>\n')
+    out_file.write('#ifdef _WIN64\n')
+    out_file.write('    typedef __int64 ssize_t;\n')
+    out_file.write('    typedef unsigned __int64 size_t;\n')
+    out_file.write('#elif _WIN32\n')
+    out_file.write('    typedef __int32 ssize_t;\n')
+    out_file.write('    typedef unsigned __int32 size_t;\n')
+    out_file.write('#else\n')
+    out_file.write('    #include <sys/types.h> // for ssize_t\n')
+    out_file.write('#endif\n')
+
+# writes the typedefs, constants, structs, functions and unicode names of a header,
+# if keep is given only the names in it are written
+def writeDefinitions(out_file, jsondata, keep=None):
+    name_kind_map = {}
+    # write typedefs
+    types = jsondata["types"]
+    if keep is not None:
+        types = [info for info in types if info["name"] in keep]
+    out_file.write("//\n")
+    out_file.write("// typedefs\n")
+    out_file.write("//\n")
+    for info in types:
+        kind = info["kind"]
+        name = info["name"]
+        name_kind_map[name] = NAME_KIND_TYPE
+        if kind == "typedef":
+            out_file.write("typedef ")
+            out_file.write(typeRefAndName(info["definition"], name))
+            out_file.write(";\n")
+        elif kind == "struct":
+            out_file.write("typedef struct {} {};\n".format(name, name))
+        else:
+            assert(False)
+    constants = jsondata["constants"]
+    if keep is not None:
+        constants = [info for info in constants if info["name"] in keep]
+    if len(constants) > 0:
+        out_file.write("//\n")
+        out_file.write("// constants\n")
+        out_file.write("//\n")
+        for info in constants:
+            name = info["name"]
+            type = info["type"]
+            if isVoid(type):
+                out_file.write("#define {} {}\n".format(name, info["value"]))
+            else:
+                out_file.write("#define {} ((".format(name))
+                out_file.write(typeRefNoName(type))
+                out_file.write("){})\n".format(info["value"]))
+    out_file.write("//\n")
+    out_file.write("// structs\n")
+    out_file.write("//\n")
+    for info in types:
+        kind = info["kind"]
+        if kind == "typedef":
+            continue
+        elif kind == "struct":
+            out_file.write("struct {} {{\n".format(info["name"]))
+            out_file.write("".join([FIELD_TEMPLATE.format(typeRefAndName(field["type"], field["name"])) for field in info["fields"]]))
+            out_file.write("};\n")
+        else:
+            assert(False)
+    functions = jsondata["functions"]
+    if keep is not None:
+        functions = [info for info in functions if info["name"] in keep]
+    if len(functions) > 0:
+        out_file.write("//\n")
+        out_file.write("// {} functions\n".format(len(functions)))
+        out_file.write("//\n")
+        for info in functions:
+            func_name = info["name"]
+            name_kind_map[func_name] = NAME_KIND_FUNC
+            out_file.write(FUNCTION_TEMPLATE.format(typeRefNoName(info["return_type"]), func_name,
+                ",".join(["\n    " + typeRefAndName(arg["type"], arg["name"]) for arg in info["args"]])))
+    unicode_names = jsondata["unicode_names"]
+    if keep is not None:
+        unicode_names = [name_obj for name_obj in unicode_names if name_obj["name"] in keep]
+    if len(unicode_names) > 0:
+        def printUnicodeDefs(suffix, other_suffix):
+            for name_obj in unicode_names:
+                unicode_name = name_obj["name"]
+                name_with_suffix = unicode_name + suffix
+                kind = name_kind_map.get(name_with_suffix)
+                if kind == None:
+                    other_name_with_suffix = unicode_name + other_suffix
+                    if name_kind_map.get(other_name_with_suffix) == None:
+                        sys.exit("Error: invalid @unicode '{}' because neither '{}' nor '{}' exist as a type/function".format(unicode_name, name_with_suffix, other_name_with_suffix))
+                    out_file.write("    // symbol '{}' does not exist, only '{}' does\n".format(name_with_suffix, other_name_with_suffix))
+                elif kind == NAME_KIND_TYPE:
+                    out_file.write("    typedef {} {};\n".format(name_with_suffix, unicode_name))
+                else:
+                    assert(kind == NAME_KIND_FUNC)
+                    out_file.write("    #define {} {}\n".format(unicode_name, name_with_suffix))
+
+        out_file.write("//\n")
+        out_file.write("// {} unicode_names\n".format(len(unicode_names)))
+        out_file.write("//\n")
+        out_file.write("#ifdef UNICODE\n")
+        printUnicodeDefs("W", "A")
+        out_file.write("#else // UNICODE\n")
+        printUnicodeDefs("A", "W")
+        out_file.write("#endif // UNICODE\n")
+
+def generateHeader(header):
+    print("generating: {}".format(header.header_filename))
+    writeHeader(header, renderHeader(header))
+
+# returns the text of a header, it's built in memory and written with a single call
+def renderHeader(header):
+    out_file = io.StringIO()
+    out_file.write('#ifndef __{}_header_guard__\n'.format(header.name))
+    out_file.write('#define __{}_header_guard__\n'.format(header.name))
+    writePreamble(out_file)
+    include_name_map = {}
+    includes = header.jsondata["includes"]
+    out_file.write("//\n")
+    out_file.write("// {} explicit includes\n".format(len(includes)))
+    out_file.write("//\n")
+    for inc in includes:
+        filename = inc["filename"]
+        out_file.write("#include <{}.h>\n".format(filename))
+        include_name_map[filename] = True
+    out_file.write("//\n")
+    out_file.write("// implicit includes\n")
+    out_file.write("//\n")
+    for i in header.imports:
+        if not include_name_map.get(i.name):
+            out_file.write("#include <{}.h>\n".format(i.name))
+    writeDefinitions(out_file, header.jsondata)
+    out_file.write('#endif // __{}_header_guard__\n'.format(header.name))
+    return out_file.getvalue()
+
+def writeHeader(header, text):
+    with open(header.header_filename, "w") as file:
+        file.write(text)
+
+# returns the headers ordered so each one comes after the headers it includes or imports,
+# a cycle is broken where it's found like the include guards of the separate headers do
+def sortHeaders(headers, header_map):
+    order = []
+    visited = {}
+    def visit(header):
+        if header.name in visited:
+            return
+        visited[header.name] = True
+        for inc in header.jsondata["includes"]:
+            included = header_map.get(inc["filename"])
+            if included:
+                visit(included)
+        for i in header.imports:
+            visit(i)
+        order.append(header)
+    for header in headers:
+        visit(header)
+    return order
+
+# returns the given names (functions, constants or types) and the names of every type they
+# need, a name of an @unicode function/type selects both of its variants
+def getReachableNames(headers, names):
+    definitions = {}
+    unicode_names = {}
+    for header in headers:
+        for info in header.jsondata["types"] + header.jsondata["constants"] + header.jsondata["functions"]:
+            definitions.setdefault(info["name"], info)
+        for info in header.jsondata["unicode_names"]:
+            unicode_names[info["name"]] = True
+    keep = {}
+    pending = []
+    for name in names:
+        if name in unicode_names:
+            keep[name] = True
+            pending.extend(name + suffix for suffix in ("A", "W") if name + suffix in definitions)
+        elif name in definitions:
+            pending.append(name)
+        else:
+            sys.exit("Error: '{}' is not defined".format(name))
+    while pending:
+        name = pending.pop()
+        if name in keep:
+            continue
+        keep[name] = True
+        info = definitions.get(name)
+        if info is None:
+            continue
+        type_refs = {}
+        if "return_type" in info:
+            symbols.addJsonTypeRefs(type_refs, info["return_type"])
+            for arg in info["args"]:
+                symbols.addJsonTypeRefs(type_refs, arg["type"])
+        elif "value" in info:
+            symbols.addJsonTypeRefs(type_refs, info["type"])
+            if isinstance(info["value"], str):
+                type_refs[info["value"]] = True
+        elif info["kind"] == "typedef":
+            symbols.addJsonTypeRefs(type_refs, info["definition"])
+        else:
+            for field in info["fields"]:
+                symbols.addJsonTypeRefs(type_refs, field["type"])
+        pending.extend(type_refs)
+    return keep
+
+# writes every header into a single file, or only the names in keep if it's given
+def generateAmalgamation(filename, headers, keep):
+    print("generating: {}".format(filename))
+    guard = re.sub("[^A-Za-z0-9_]", "_", os.path.basename(filename))
+    out_file = io.StringIO()
+    out_file.write('#ifndef __{}_header_guard__\n'.format(guard))
+    out_file.write('#define __{}_header_guard__\n'.format(guard))
+    writePreamble(out_file)
+    for header in headers:
+        if keep is None:
+            # including one of the separate headers after this one does nothing
+            out_file.write('#define __{}_header_guard__\n'.format(header.name))
+        else:
+            jsondata = header.jsondata
+            if not any(info["name"] in keep for section in ("types", "constants", "functions", "unicode_names") for info in jsondata[section]):
+                continue
+        out_file.write("//\n")
+        out_file.write("// {}\n".format(header.name))
+        writeDefinitions(out_file, header.jsondata, keep)
+    out_file.write('#endif // __{}_header_guard__\n'.format(guard))
+    with open(filename, "w") as file:
+        file.write(out_file.getvalue())
+
+def hashTypeExports(type_exports):
+    return manifest.hashBytes("\n".join(sorted(type_exports)).encode("utf8"))
+
+# returns a symbol index of the types exported by each header
+def buildTypeIndex(headers):
+    type_index = symbols.SymbolIndex()
+    for header in headers:
+        type_index.setHeader(header.name, header.json_filename,
+                             [(name, kind, 0, 0, []) for name, kind in header.type_exports.items()])
+    return type_index
+
+# exits with the type conflicts of a type index, symbol_index is the index saved by json-gen
+# (if available) which knows where each symbol is defined in the .api files
+def exitWithConflicts(conflicts, symbol_index):
+    if symbol_index is not None:
+        names = {conflict.first.name: True for conflict in conflicts}
+        located = [conflict for conflict in symbol_index.getConflicts() if conflict.first.name in names]
+        if located:
+            conflicts = located
+    sys.exit("\n".join("Error: type conflict: {}".format(conflict) for conflict in conflicts))
+
+# fills in the imports of each header from its type_refs, returns the header name -> header map
+def resolveImports(headers, type_index):
+    header_map = {header.name: header for header in headers}
+    for header in headers:
+        for type_ref in header.type_refs:
+            if type_ref in header.type_exports:
+                continue
+            need = type_index.lookup(type_ref)
+            if not need:
+                sys.exit("Error: undefined type '{}' appears in '{}'".format(type_ref, header.json_filename))
+            header.imports[header_map[need.header]] = True
+    return header_map
+
+def getManifest(generator_version, headers, json_hashes, exports_hashes):
+    return {"generator_version":generator_version,"headers":{
+        header.name: {
+            "json_hash":json_hashes[header.name],
+            "type_refs":list(header.type_refs),
+            "type_exports":header.type_exports,
+            "exports_hash":exports_hashes[header.name],
+            "imports":[i.name for i in header.imports],
+        } for header in headers}}
@@ -0,0 +1,61 @@
+#
+# Folds the named values of constants (i.e. "void _WIN32_IE_NT4 = _WIN32_IE_IE20;") to
+# the integer they end up referring to, following the names across headers.  Each
+# constant is only folded once no matter how many other constants refer to it.
+#
+
+class FoldError(Exception):
+    pass
+
+# returns {constant name: json data} for the constants of all headers, the first definition of a name wins
+def getConstants(jsondatas):
+    constants = {}
+    for jsondata in jsondatas:
+        for info in jsondata["constants"]:
+            constants.setdefault(info["name"], info)
+    return constants
+
+class Folder:
+    # constants maps each constant name to its json data
+    def __init__(self, constants):
+        self.constants = constants
+        # name -> folded integer value
+        self.folded = {}
+        # the names being folded, in order, to report cycles
+        self.folding = []
+
+    # returns the integer value of a constant
+    def fold(self, name):
+        value = self.folded.get(name)
+        if value is not None:
+            return value
+        info = self.constants.get(name)
+        if info is None:
+            raise FoldError("constant '{}' is not defined".format(name))
+        value = info["value"]
+        if isinstance(value, str):
+            if name in self.folding:
+                cycle = self.folding[self.folding.index(name):] + [name]
+                raise FoldError("constant '{}' refers to itself ({})".format(name, " -> ".join(cycle)))
+            self.folding.append(name)
+            try:
+                value = self.fold(value)
+            finally:
+                self.folding.pop()
+        self.folded[name] = value
+        return value
+
+# returns ({constant name: integer value}, errors) for every constant in constants whose
+# value is a name, errors is a list of (name, message) for the ones that can't be folded
+def foldConstants(constants):
+    folder = Folder(constants)
+    folded = {}
+    errors = []
+    for name, info in constants.items():
+        if not isinstance(info["value"], str):
+            continue
+        try:
+            folded[name] = folder.fold(name)
+        except FoldError as err:
+            errors.append((name, "cannot fold constant '{}': {}".format(name, err)))
+    return folded, errors
@@ -0,0 +1,101 @@
+#
+# Joins the functions declared by the headers in out/json with the functions
+# exported by the dlls in out/dll-json (see dll-check).
+#
+import os
+import json
+
+import typepool
+
+UNICODE_SUFFIXES = ("A", "W")
+
+# returns {header: jsondata} for the json files in json_dir
+def loadHeaders(json_dir):
+    headers = {}
+    for entry_basename in sorted(os.listdir(json_dir)):
+        if entry_basename.endswith(".json"):
+            with open(os.path.join(json_dir, entry_basename), "r") as file:
+                headers[entry_basename[:-5]] = typepool.load(file)
+    return headers
+
+# returns {dll: funcs} for the json files written by dll-json-gen, dlls found in
+# subdirectories are named by their relative path (i.e. "downlevel/foo")
+def loadDlls(dll_json_dir):
+    dlls = {}
+    for dir_path, dir_names, file_names in os.walk(dll_json_dir):
+        for file_name in file_names:
+            if file_name.endswith(".json"):
+                filename = os.path.join(dir_path, file_name)
+                with open(filename, "r") as file:
+                    dlls[os.path.relpath(filename, dll_json_dir)[:-5].replace(os.sep, "/")] = json.load(file)
+    return dlls
+
+# status of an @unicode name whose A/W variants are functions
+def getUnicodeStatus(variants):
+    if not all(variant["declared"] for variant in variants.values()):
+        return "unpaired"
+    if not all(variant["exported"] for variant in variants.values()):
+        return "missing_export"
+    return "ok"
+
+def buildReport(headers, dlls):
+    # function name -> the header that declares it
+    declared = {}
+    for header in sorted(headers):
+        for info in headers[header]["functions"]:
+            declared.setdefault(info["name"], header)
+    # export name -> the dlls that export it
+    exported = {}
+    for dll in sorted(dlls):
+        for func in dlls[dll]:
+            exported.setdefault(func["name"], []).append(dll)
+
+    header_reports = {}
+    for header in sorted(headers):
+        functions = headers[header]["functions"]
+        missing = []
+        dll_counts = {}
+        for info in functions:
+            export_dlls = exported.get(info["name"])
+            if export_dlls is None:
+                missing.append(info["name"])
+                continue
+            for dll in export_dlls:
+                dll_counts[dll] = dll_counts.get(dll, 0) + 1
+        header_reports[header] = {"declared":len(functions),"exported":len(functions) - len(missing),
+                                  "missing":missing,"dlls":{dll: dll_counts[dll] for dll in sorted(dll_counts)}}
+
+    dll_reports = {}
+    for dll in sorted(dlls):
+        funcs = dlls[dll]
+        undeclared = [func["name"] for func in funcs if func["name"] not in declared]
+        dll_reports[dll] = {"exports":len(funcs),"declared":len(funcs) - len(undeclared),"undeclared":undeclared}
+
+    unicode_reports = []
+    # @unicode names of types (i.e. structs) have nothing to export and are only counted
+    unicode_type_count = 0
+    for header in sorted(headers):
+        for info in headers[header]["unicode_names"]:
+            name = info["name"]
+            variants = {suffix: {"declared":name + suffix in declared,"exported":name + suffix in exported}
+                        for suffix in UNICODE_SUFFIXES}
+            if not any(variant["declared"] for variant in variants.values()):
+                unicode_type_count += 1
+                continue
+            unicode_reports.append({"name":name,"header":header,"status":getUnicodeStatus(variants),"variants":variants})
+
+    declared_exported = sum(report["exported"] for report in header_reports.values())
+    export_count = sum(report["exports"] for report in dll_reports.values())
+    unicode_counts = {}
+    for report in unicode_reports:
+        unicode_counts[report["status"]] = unicode_counts.get(report["status"], 0) + 1
+    summary = {
+        "headers":len(headers),
+        "dlls":len(dlls),
+        "declared":len(declared),
+        "declared_exported":declared_exported,
+        "exports":export_count,
+        "exports_declared":sum(report["declared"] for report in dll_reports.values()),
+        "unicode":dict(sorted(unicode_counts.items()), types=unicode_type_count),
+    }
+    return {"summary":summary,"headers":header_reports,"dlls":dll_reports,"unicode":unicode_reports}
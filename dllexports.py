@@ -0,0 +1,59 @@
+#
+# Reads the exports of DLLs for dll-json-gen.  The result for each DLL is cached in
+# the manifest next to the output directory (i.e. out/dll-json-manifest.json) along
+# with the size, mtime and hash of the file so unchanged DLLs are not read again.
+#
+import os
+import time
+
+import pe
+import manifest
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# cached results are dropped whenever the code that produced them changes
+def getReaderVersion():
+    return manifest.hashFiles([os.path.join(SCRIPT_DIR, "dllexports.py"), os.path.join(SCRIPT_DIR, "pe.py")])
+
+# exports by ordinal only (NONAME) are skipped, the rest are listed in name order like dumpbin does
+def exportsToJsonData(exports):
+    return [{"name":export.name,"ordinal":export.ordinal}
+            for export in sorted((e for e in exports if e.name is not None), key=lambda e: e.name)]
+
+# returns (hash, funcs, error) for the given dll, funcs and error are both None if the
+# file hash equals old_hash (the file was touched but its content didn't change).  The
+# dll is mapped with mmap and hashed and parsed from the same mapping.
+def readDll(filename, old_hash, stats=None):
+    start = time.perf_counter()
+    try:
+        with pe.mapFile(filename) as data:
+            map_end = time.perf_counter()
+            hash = manifest.hashBytes(data)
+            hash_end = time.perf_counter()
+            if stats is not None:
+                stats.addTime("read", map_end - start, filename)
+                stats.addTime("hash", hash_end - map_end, filename)
+                stats.count("dlls read")
+                stats.count("input bytes", len(data))
+            if hash == old_hash:
+                return hash, None, None
+            try:
+                funcs = exportsToJsonData(pe.getExports(data, filename))
+            except pe.FormatError as err:
+                return hash, None, str(err)
+            finally:
+                if stats is not None:
+                    stats.addTime("parse", time.perf_counter() - hash_end, filename)
+    except OSError as err:
+        return None, None, str(err)
+    if stats is not None:
+        stats.count("exports", len(funcs))
+    return hash, funcs, None
+
+def getCacheEntry(stat, hash, funcs, error):
+    entry = {"size":stat.st_size,"mtime_ns":stat.st_mtime_ns,"hash":hash}
+    if error is None:
+        entry["funcs"] = funcs
+    else:
+        entry["error"] = error
+    return entry
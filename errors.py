@@ -1,6 +1,20 @@
+import bisect
+
 def getLineAndCol(str):
     lineno = 1 + str.count("\n")
     lastnewline = str.rfind("\n")
-    if lastnewline == -1:
-            lastnewline = 0
-    return lineno, len(str) - lastnewline + 1
+    return lineno, len(str) - lastnewline
+
+def getNewlineOffsets(str):
+    offsets = []
+    pos = str.find("\n")
+    while pos != -1:
+        offsets.append(pos)
+        pos = str.find("\n", pos + 1)
+    return offsets
+
+# same result as getLineAndCol(str[:pos]) given the offsets from getNewlineOffsets(str)
+def getLineAndColFromOffsets(newline_offsets, pos):
+    newline_count = bisect.bisect_left(newline_offsets, pos)
+    lastnewline = newline_offsets[newline_count - 1] if newline_count > 0 else -1
+    return 1 + newline_count, pos - lastnewline
@@ -0,0 +1,134 @@
+#
+# Computes the size, alignment and field offsets of structs for each target from the
+# json data of all headers.  Typedefs are followed across headers down to native
+# types, pointers never need their subtype so only by-value containment is resolved.
+# There is no packing information in the .api files, so every struct uses the
+# natural (default) alignment.
+#
+import nativetypes
+
+# target -> pointer size
+TARGETS = {"x86": 4, "x64": 8}
+
+# native type -> size, None means the pointer size, void has no layout
+NATIVE_SIZES = {
+    "int": 4,
+    "unsigned": 4,
+    "uint8_t": 1,
+    "uint16_t": 2,
+    "uint32_t": 4,
+    "uint64_t": 8,
+    "size_t": None,
+    "int8_t": 1,
+    "int16_t": 2,
+    "int32_t": 4,
+    "int64_t": 8,
+    "ssize_t": None,
+    "char": 1,
+    "wchar_t": 2,
+}
+assert(set(NATIVE_SIZES) == set(nativetypes.NATIVE_TYPES) - {"void"})
+
+class LayoutError(Exception):
+    pass
+
+class StructLayout:
+    __slots__ = ("size", "align", "offsets")
+    def __init__(self, size, align, offsets):
+        self.size = size
+        self.align = align
+        self.offsets = offsets
+    def toJsonData(self):
+        return {"size":self.size,"align":self.align,"offsets":self.offsets}
+
+class LayoutEngine:
+    # definitions maps each type name to its json data (a typedef or struct entry)
+    def __init__(self, definitions, pointer_size):
+        self.definitions = definitions
+        self.pointer_size = pointer_size
+        # name -> (size, align), struct names also have an entry in struct_layouts
+        self.named_layouts = {}
+        self.struct_layouts = {}
+        # the names being resolved, in order, to report cycles
+        self.resolving = []
+
+    def getNamedLayout(self, name):
+        layout = self.named_layouts.get(name)
+        if layout is not None:
+            return layout
+        info = self.definitions.get(name)
+        if info is None:
+            raise LayoutError("type '{}' is not defined".format(name))
+        if name in self.resolving:
+            cycle = self.resolving[self.resolving.index(name):] + [name]
+            raise LayoutError("type '{}' contains itself ({})".format(name, " -> ".join(cycle)))
+        self.resolving.append(name)
+        try:
+            if info["kind"] == "typedef":
+                layout = self.getTypeLayout(info["definition"])
+            else:
+                struct_layout = self.computeStructLayout(info)
+                self.struct_layouts[name] = struct_layout
+                layout = (struct_layout.size, struct_layout.align)
+        finally:
+            self.resolving.pop()
+        self.named_layouts[name] = layout
+        return layout
+
+    # returns the (size, align) of a json type
+    def getTypeLayout(self, type):
+        kind = type["kind"]
+        if kind == "alias":
+            return self.getNamedLayout(type["name"])
+        if kind == "native":
+            if type["name"] == "void":
+                raise LayoutError("type 'void' has no size")
+            size = NATIVE_SIZES[type["name"]] or self.pointer_size
+            return size, size
+        if kind == "fixedlenarray":
+            size, align = self.getTypeLayout(type["subtype"])
+            return size * type["len"], align
+        # singleptr, arrayptr and funcptr
+        return self.pointer_size, self.pointer_size
+
+    def computeStructLayout(self, info):
+        offset = 0
+        struct_align = 1
+        offsets = []
+        for field in info["fields"]:
+            size, align = self.getTypeLayout(field["type"])
+            offset = (offset + align - 1) & ~(align - 1)
+            offsets.append(offset)
+            offset += size
+            struct_align = max(struct_align, align)
+        size = (offset + struct_align - 1) & ~(struct_align - 1)
+        return StructLayout(size, struct_align, offsets)
+
+    # returns the StructLayout of the named struct
+    def getStructLayout(self, name):
+        self.getNamedLayout(name)
+        return self.struct_layouts[name]
+
+# returns {name: json data} of the types defined by the given json data, the first
+# definition of a name wins (conflicts are reported by the symbol index)
+def getDefinitions(jsondatas):
+    definitions = {}
+    for jsondata in jsondatas:
+        for info in jsondata["types"]:
+            definitions.setdefault(info["name"], info)
+    return definitions
+
+# returns ({struct name: {target: layout json data}}, errors) for every struct in definitions,
+# structs whose layout can't be computed are left out and reported in errors as (name, message)
+def computeLayouts(definitions):
+    engines = {target: LayoutEngine(definitions, pointer_size) for target, pointer_size in TARGETS.items()}
+    layouts = {}
+    errors = []
+    for name, info in definitions.items():
+        if info["kind"] != "struct":
+            continue
+        try:
+            layouts[name] = {target: engine.getStructLayout(name).toJsonData() for target, engine in engines.items()}
+        except LayoutError as err:
+            errors.append((name, "cannot compute the layout of struct '{}': {}".format(name, err)))
+    return layouts, errors
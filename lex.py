@@ -1,3 +1,5 @@
+import re
+
 TOKEN_KINDS = (
     ("ID",None),
     ("ID_SPECIAL",None),
@@ -18,13 +20,13 @@ TOKEN_KINDS = (
     ("UNSUPPORTED",None),
 )
 
+# there is exactly one TokenKind instance per kind, so kinds are compared by identity
 class TokenKind:
+    __slots__ = ("num", "name", "val")
     def __init__(self, num, name, val):
         self.num = num
         self.name = name
         self.val = val
-    def __eq__(self, other):
-        return self.num == other.num
     def __repr__(self):
         return self.val if self.val else self.name
 
@@ -36,6 +38,7 @@ def createTokenVars():
 createTokenVars()
 
 class Token:
+    __slots__ = ("kind", "start", "end")
     def __init__(self, kind, start, end):
         self.kind = kind
         self.start = start
@@ -52,6 +55,7 @@ class Token:
         #return self.kind.name
 
 class StringToken(Token):
+    __slots__ = ("value",)
     def __init__(self, start, end, value):
         Token.__init__(self, STRING, start, end)
         self.value = value
@@ -59,6 +63,7 @@ class StringToken(Token):
         return "STRING {}".format(str[self.start:self.end])
 
 class NumberToken(Token):
+    __slots__ = ("value_str", "value")
     def __init__(self, start, end, value_str, value):
         Token.__init__(self, NUMBER, start, end)
         self.value_str = value_str
@@ -254,3 +259,64 @@ def isIdChar(c):
         return c <= ord('Z') or c == ord('_')
     if c >= ord('0'):
         return c <= ord('9')
+
+
+PUNCTUATION_KINDS = {
+    "(": LEFT_PAREN,
+    ")": RIGHT_PAREN,
+    ";": SEMICOLON,
+    "{": LEFT_CURLY,
+    "}": RIGHT_CURLY,
+    "*": STAR,
+    "-": DASH,
+    "[": LEFT_BRACKET,
+    "]": RIGHT_BRACKET,
+    ",": COMMA,
+    "=": EQUAL,
+}
+
+# Matches the trivia before a token followed by the token itself.  The token
+# alternatives only cover the common well-formed cases, anything else (strings,
+# EOF, malformed input) leaves the token group unmatched and is handed to the
+# character-by-character Lexer so both lexers produce identical tokens/errors.
+FAST_TOKEN_REGEX = re.compile(r"""
+    (?:[ \n]+|\#[^\n]*)*
+    (?:
+        (?P<id>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<special>@[A-Za-z0-9_]+)
+      | (?P<hex>0[xX][0-9a-fA-F]+)
+      | (?P<dec>[1-9][0-9]*|0(?![xX0-7]))
+      | (?P<punct>[()\;{}*\-\[\],=])
+    )?
+""", re.VERBOSE)
+
+class FastLexer(Lexer):
+    def __init__(self, reader):
+        Lexer.__init__(self, reader)
+        self.match = FAST_TOKEN_REGEX.match
+
+    def lexToken(self):
+        reader = self.reader
+        m = self.match(reader.str, reader.index)
+        group = m.lastgroup
+        if group is None:
+            reader.index = m.end()
+            return Lexer.lexToken(self)
+        start = m.start(group)
+        end = m.end()
+        reader.index = end
+        if group == "id":
+            return Token(ID, start, end)
+        if group == "punct":
+            return Token(PUNCTUATION_KINDS[reader.str[start]], start, end)
+        if group == "special":
+            return Token(ID_SPECIAL, start, end)
+        value_str = reader.str[start:end]
+        if group == "hex":
+            return NumberToken(start, end, value_str, int(value_str, 16))
+        return NumberToken(start, end, value_str, int(value_str))
+
+LEXERS = {
+    "simple": Lexer,
+    "fast": FastLexer,
+}
@@ -0,0 +1,37 @@
+import os
+import json
+import hashlib
+
+def hashBytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def hashFile(filename):
+    with open(filename, "rb") as file:
+        return hashBytes(file.read())
+
+# returns a hash of the given files, used as the "generator version" of a tool
+# so its outputs are regenerated whenever the tool itself changes
+def hashFiles(filenames):
+    hasher = hashlib.sha256()
+    for filename in filenames:
+        with open(filename, "rb") as file:
+            hasher.update(file.read())
+    return hasher.hexdigest()
+
+# a manifest lives next to the output directory it describes (i.e. out/json-manifest.json)
+# so it survives a clean of the output directory
+def getFilename(out_dir):
+    return os.path.normpath(out_dir) + "-manifest.json"
+
+def load(manifest_filename):
+    if not os.path.exists(manifest_filename):
+        return None
+    with open(manifest_filename, "r") as file:
+        return json.load(file)
+
+def save(manifest_filename, manifest):
+    tmp_filename = manifest_filename + ".tmp"
+    text = json.dumps(manifest, sort_keys=True)
+    with open(tmp_filename, "w") as file:
+        file.write(text)
+    os.replace(tmp_filename, manifest_filename)
@@ -1,9 +1,12 @@
+import sys
+
 import lex
 
 class Node:
-    pass
+    __slots__ = ()
 
 class ConstNode(Node):
+    __slots__ = ("first_type_token", "type", "name", "value")
     def __init__(self, first_type_token, type, name, value):
         Node.__init__(self)
         self.first_type_token = first_type_token
@@ -14,6 +17,7 @@ class ConstNode(Node):
         return self.first_type_token
 
 class TypedefNode(Node):
+    __slots__ = ("typedef_token", "name", "def_type")
     def __init__(self, typedef_token, name, def_type):
         Node.__init__(self)
         self.typedef_token = typedef_token
@@ -23,6 +27,7 @@ class TypedefNode(Node):
         return self.typedef_token
 
 class StructNode(Node):
+    __slots__ = ("struct_token", "name", "fields")
     def __init__(self, struct_token, name, fields):
         Node.__init__(self)
         self.struct_token = struct_token
@@ -32,6 +37,7 @@ class StructNode(Node):
         return self.struct_token
 
 class FieldNode(Node):
+    __slots__ = ("first_type_token", "type", "name")
     def __init__(self, first_type_token, type, name):
         Node.__init__(self)
         self.first_type_token = first_type_token
@@ -41,6 +47,7 @@ class FieldNode(Node):
         return self.first_type_token
 
 class FuncNode(Node):
+    __slots__ = ("first_type_token", "name", "return_type", "args")
     def __init__(self, first_type_token, name, return_type, args):
         Node.__init__(self)
         self.first_type_token = first_type_token
@@ -51,6 +58,7 @@ class FuncNode(Node):
         return self.first_type_token
 
 class ArgNode(Node):
+    __slots__ = ("type", "name_token", "name")
     def __init__(self, type, name_token, name):
         Node.__init__(self)
         self.type = type
@@ -60,6 +68,7 @@ class ArgNode(Node):
         return self.name_token
 
 class UnicodeNode(Node):
+    __slots__ = ("unicode_token", "name")
     def __init__(self, unicode_token, name):
         Node.__init__(self)
         self.unicode_token = unicode_token
@@ -68,39 +77,46 @@ class UnicodeNode(Node):
         return self.unicode_token
 
 class IncludeNode(Node):
+    __slots__ = ("include_token", "filename_no_ext")
     def __init__(self, include_token, filename_no_ext):
         Node.__init__(self)
         self.include_token = include_token
         self.filename_no_ext = filename_no_ext
     def getToken(self):
-        return self.unicode_token
+        return self.include_token
 
 class Type:
-    pass
+    __slots__ = ()
 class NamedType(Type):
+    __slots__ = ("name",)
     def __init__(self, name):
         self.name = name
     def __repr__(self):
         return self.name
+
 class SinglePtrType(Type):
+    __slots__ = ("sub_type", "const")
     def __init__(self, sub_type, const):
         self.sub_type = sub_type
         self.const = const
     def __repr__(self):
         return "{}{}*".format("const " if self.const else "", self.sub_type)
 class ArrayPtrType(Type):
+    __slots__ = ("sub_type", "const")
     def __init__(self, sub_type, const):
         self.sub_type = sub_type
         self.const = const
     def __repr__(self):
         return "{}{}[*]".format("const " if self.const else "", self.sub_type)
 class FuncPtrType(Type):
+    __slots__ = ("return_type", "args")
     def __init__(self, return_type, args):
         self.return_type = return_type
         self.args = args
     def __repr__(self):
         return "funcptr {}({})".format(self.return_type, [", ".join(str(a)) for a in self.args])
 class FixedLenArrayType(Type):
+    __slots__ = ("sub_type", "len")
     def __init__(self, sub_type, len):
         self.sub_type = sub_type
         self.len = len
@@ -108,37 +124,74 @@ class FixedLenArrayType(Type):
         return "{}[{}]".format(self.sub_type, self.len)
 
 class ConstValue:
-    pass
+    __slots__ = ()
 class Integer(ConstValue):
+    __slots__ = ("int_value",)
     def __init__(self, int_value):
         self.int_value = int_value
     def __repr__(self):
         return "{}".format(self.int_value)
 class NamedValue(ConstValue):
+    __slots__ = ("name",)
     def __init__(self, name):
         self.name = name
     def __repr__(self):
         return "{}".format(self.name)
 
+# the grammar only needs 1 token of lookahead, that token is kept in a single slot.
+# Further tokens (peekToken with an offset) go in a ring buffer of LOOKAHEAD_SIZE
+# tokens for future grammar additions (must be a power of 2)
+LOOKAHEAD_SIZE = 4
+LOOKAHEAD_MASK = LOOKAHEAD_SIZE - 1
+
 class Parser:
     def __init__(self, lexer: lex.Lexer):
         self.lexer = lexer
-        self.lookahead = []
+        self.next_token = None
+        self.lookahead = [None] * LOOKAHEAD_SIZE
+        self.lookahead_start = 0
+        self.lookahead_count = 0
         self.str = lexer.reader.str
+        # NamedType instances are immutable, so all references to the same name in a file
+        # share one instance.  The cache belongs to the parser so it goes away with it
+        # instead of growing for the life of the process (i.e. api-daemon).
+        self.named_types = {}
 
-    def peekToken(self):
-        if not self.lookahead:
-            self.lookahead.append(self.lexer.lexToken())
-        return self.lookahead[0]
+    def peekToken(self, offset=0):
+        if offset == 0:
+            token = self.next_token
+            if token is None:
+                token = self.next_token = self.lexer.lexToken()
+            return token
+        # offset N is the token after next_token at ring index N - 1
+        self.peekToken()
+        assert(offset <= LOOKAHEAD_SIZE)
+        while self.lookahead_count < offset:
+            self.lookahead[(self.lookahead_start + self.lookahead_count) & LOOKAHEAD_MASK] = self.lexer.lexToken()
+            self.lookahead_count += 1
+        return self.lookahead[(self.lookahead_start + offset - 1) & LOOKAHEAD_MASK]
 
     def popToken(self):
-        assert(self.lookahead)
-        self.lookahead.pop(0)
+        assert(self.next_token is not None)
+        if self.lookahead_count == 0:
+            self.next_token = None
+        else:
+            self.next_token = self.lookahead[self.lookahead_start]
+            self.lookahead_start = (self.lookahead_start + 1) & LOOKAHEAD_MASK
+            self.lookahead_count -= 1
+
+    # the error message is only formatted if the token doesn't match
+    def expectToken(self, kind, context):
+        token = self.peekToken()
+        if token.kind is not kind:
+            self.errAt(token, "expected {} {} but got {}".format(kind, context, token.desc(self.str)))
+        self.popToken()
+        return token
 
     def peekPopKnownToken(self, context, kinds):
         token = self.peekToken()
         if not token.kind in kinds:
-            expected = kinds[0] if len(kinds) == 1 else "one of {}".format(", ".join(kinds))
+            expected = kinds[0] if len(kinds) == 1 else "one of {}".format(", ".join(str(kind) for kind in kinds))
             self.errAt(token, "expected {} {} but got {}".format(expected, context, token.desc(self.str)))
         self.popToken()
         return token
@@ -146,13 +199,48 @@ class Parser:
     def errAt(self, token, msg):
         self.lexer.errAt(token.start, msg)
 
+    # names are interned since the same names (types, args) repeat throughout the AST
+    def tokenName(self, token):
+        return sys.intern(self.str[token.start:token.end])
+
     def parseInto(self, nodes):
+        nodes.extend(self.iterDefinitions())
+
+    # yields each definition as it is parsed so callers don't have to hold every node
+    def iterDefinitions(self):
         while True:
             node = self.parseDefinition()
+            if not node:
+                break
+            yield node
+
+    # like parseInto but rather than raising on the first lex.SyntaxError, appends every
+    # error to errors and recovers by skipping past the next ';' or '}'
+    def parseIntoCollectingErrors(self, nodes, errors):
+        while True:
+            try:
+                node = self.parseDefinition()
+            except lex.SyntaxError as err:
+                errors.append(err)
+                self.skipToEndOfDefinition(errors)
+                continue
             if not node:
                 break
             nodes.append(node)
 
+    def skipToEndOfDefinition(self, errors):
+        while True:
+            try:
+                token = self.peekToken()
+            except lex.SyntaxError as err:
+                errors.append(err)
+                continue
+            if token.kind == lex.EOF:
+                return
+            self.popToken()
+            if token.kind == lex.SEMICOLON or token.kind == lex.RIGHT_CURLY:
+                return
+
     def parseDefinition(self):
         first_token = self.peekToken()
         #print("[DEBUG] parseExpressionPart token={}".format(first_token.desc(self.str)))
@@ -180,13 +268,13 @@ class Parser:
         # must be a function or constant
         #
         type = self.parseType()
-        name_token = self.peekPopKnownToken("after 'TYPE' (could be function or const)", (lex.ID,))
+        name_token = self.expectToken(lex.ID, "after 'TYPE' (could be function or const)")
         punctuation_token = self.peekToken()
         if punctuation_token.kind == lex.EQUAL:
             self.popToken()
             value = self.parseConstValue()
-            _ = self.peekPopKnownToken("to finish const", (lex.SEMICOLON,))
-            return ConstNode(first_token, type, self.str[name_token.start:name_token.end], value)
+            _ = self.expectToken(lex.SEMICOLON, "to finish const")
+            return ConstNode(first_token, type, self.tokenName(name_token), value)
         if punctuation_token.kind == lex.LEFT_PAREN:
             self.popToken()
             return self.parseFunc(first_token, type, name_token)
@@ -194,12 +282,12 @@ class Parser:
         self.errAt(first_token, "expected '=' or '(' after 'TYPE ID' but got {}".format(punctuation_token.desc(self.str)))
 
     def parseUnicode(self, unicode_token):
-        name_token = self.peekPopKnownToken("after @unicode", (lex.ID,))
-        _ = self.peekPopKnownToken("after @unicode ID", (lex.SEMICOLON,))
-        return UnicodeNode(unicode_token, self.str[name_token.start:name_token.end])
+        name_token = self.expectToken(lex.ID, "after @unicode")
+        _ = self.expectToken(lex.SEMICOLON, "after @unicode ID")
+        return UnicodeNode(unicode_token, self.tokenName(name_token))
 
     def parseInclude(self, include_token):
-        filename_token = self.peekPopKnownToken("after @include", (lex.STRING,))
+        filename_token = self.expectToken(lex.STRING, "after @include")
         if not filename_token.value.endswith(".h"):
             self.errAt(filename_token, "@include filenames must end with '.h' but got '{}'".format(filename_token.value))
         return IncludeNode(include_token, filename_token.value[:-2])
@@ -217,15 +305,15 @@ class Parser:
             return Integer(token.value)
         if token.kind == lex.ID:
             self.popToken()
-            return NamedValue(self.str[token.start:token.end])
+            return NamedValue(self.tokenName(token))
 
         self.errAt(token, "expected a constant value but got {}".format(token.desc(self.str)))
 
     def parseTypedef(self, typedef_token):
         def_type = self.parseType()
-        name_token = self.peekPopKnownToken("after 'typedef TYPE'", (lex.ID,))
-        _ = self.peekPopKnownToken("to finish typedef", (lex.SEMICOLON,))
-        return TypedefNode(typedef_token, self.str[name_token.start:name_token.end], def_type)
+        name_token = self.expectToken(lex.ID, "after 'typedef TYPE'")
+        _ = self.expectToken(lex.SEMICOLON, "to finish typedef")
+        return TypedefNode(typedef_token, self.tokenName(name_token), def_type)
 
     def parseType(self):
         const = False
@@ -236,7 +324,7 @@ class Parser:
         if token_str == "funcptr":
             self.popToken()
             return_type = self.parseType()
-            _ = self.peekPopKnownToken("to delimit funcptr args", (lex.LEFT_PAREN,))
+            _ = self.expectToken(lex.LEFT_PAREN, "to delimit funcptr args")
             args = self.parseFuncArgs()
             return FuncPtrType(return_type, args)
         if token_str == "const":
@@ -247,7 +335,9 @@ class Parser:
             if token.kind != lex.ID:
                 self.errAt(token, "expected ID after 'const' but got {}".format(token.desc(self.str)))
             token_str = self.str[token.start:token.end]
-        type = NamedType(token_str)
+        type = self.named_types.get(token_str)
+        if type is None:
+            type = self.named_types[token_str] = NamedType(sys.intern(token_str))
         self.popToken()
         while True:
             mod_token = self.peekToken()
@@ -259,11 +349,11 @@ class Parser:
                 array_len_token = self.peekToken()
                 if array_len_token.kind == lex.STAR:
                     self.popToken()
-                    _ = self.peekPopKnownToken("to finish array pointer '[*' type", (lex.RIGHT_BRACKET,))
+                    _ = self.expectToken(lex.RIGHT_BRACKET, "to finish array pointer '[*' type")
                     type = ArrayPtrType(type, const)
                 elif array_len_token.kind == lex.NUMBER:
                     self.popToken()
-                    _ = self.peekPopKnownToken("to finish static array type", (lex.RIGHT_BRACKET,))
+                    _ = self.expectToken(lex.RIGHT_BRACKET, "to finish static array type")
                     if const:
                         self.errAt(const_token, "static array types cannot be const")
                     type = FixedLenArrayType(type, array_len_token.value)
@@ -274,8 +364,8 @@ class Parser:
         return type
 
     def parseStruct(self, struct_token):
-        struct_name_token = self.peekPopKnownToken("after 'struct'", (lex.ID,))
-        _ = self.peekPopKnownToken("after 'struct ID'", (lex.LEFT_CURLY,))
+        struct_name_token = self.expectToken(lex.ID, "after 'struct'")
+        _ = self.expectToken(lex.LEFT_CURLY, "after 'struct ID'")
         fields = []
         while True:
             next_token = self.peekToken()
@@ -286,11 +376,11 @@ class Parser:
                 break
             field_type_token = self.peekToken()
             field_type = self.parseType()
-            field_name_token = self.peekPopKnownToken("after field type", (lex.ID,))
-            _ = self.peekPopKnownToken("to finish field declaration", (lex.SEMICOLON,))
-            fields.append(FieldNode(field_type_token, field_type, self.str[field_name_token.start:field_name_token.end]))
+            field_name_token = self.expectToken(lex.ID, "after field type")
+            _ = self.expectToken(lex.SEMICOLON, "to finish field declaration")
+            fields.append(FieldNode(field_type_token, field_type, self.tokenName(field_name_token)))
 
-        return StructNode(struct_token, self.str[struct_name_token.start:struct_name_token.end], fields)
+        return StructNode(struct_token, self.tokenName(struct_name_token), fields)
 
     def parseFuncArgs(self):
         args = []
@@ -302,16 +392,16 @@ class Parser:
                 self.popToken()
                 break
             arg_type = self.parseType()
-            arg_name_token = self.peekPopKnownToken("after argument type", (lex.ID,))
+            arg_name_token = self.expectToken(lex.ID, "after argument type")
             maybe_comma_token = self.peekToken()
             if maybe_comma_token.kind == lex.COMMA:
                 self.popToken()
             elif maybe_comma_token.kind != lex.RIGHT_PAREN:
                 self.errAt(maybe_comma_token, "expected , or ) to finish function arguments but got {}".format(maybe_comma_token.desc(self.str)))
-            args.append(ArgNode(arg_type, arg_name_token, self.str[arg_name_token.start:arg_name_token.end]))
+            args.append(ArgNode(arg_type, arg_name_token, self.tokenName(arg_name_token)))
         return args
 
     def parseFunc(self, first_token, return_type, func_name_token):
         args = self.parseFuncArgs()
-        _ = self.peekPopKnownToken("to finish function declaration", (lex.SEMICOLON,))
-        return FuncNode(first_token, self.str[func_name_token.start:func_name_token.end], return_type, args)
+        _ = self.expectToken(lex.SEMICOLON, "to finish function declaration")
+        return FuncNode(first_token, self.tokenName(func_name_token), return_type, args)
@@ -0,0 +1,154 @@
+#
+# Reads the export table of a PE/COFF image (.dll/.exe) directly from its bytes.
+#
+import os
+import mmap
+import struct
+import contextlib
+
+IMAGE_DOS_SIGNATURE = b"MZ"
+IMAGE_NT_SIGNATURE = b"PE\0\0"
+IMAGE_NT_OPTIONAL_HDR32_MAGIC = 0x10b
+IMAGE_NT_OPTIONAL_HDR64_MAGIC = 0x20b
+IMAGE_DIRECTORY_ENTRY_EXPORT = 0
+
+# offset of the data directories within the optional header
+DATA_DIRECTORY_OFFSETS = {
+    IMAGE_NT_OPTIONAL_HDR32_MAGIC: 96,
+    IMAGE_NT_OPTIONAL_HDR64_MAGIC: 112,
+}
+# offset of NumberOfRvaAndSizes within the optional header
+RVA_COUNT_OFFSETS = {
+    IMAGE_NT_OPTIONAL_HDR32_MAGIC: 92,
+    IMAGE_NT_OPTIONAL_HDR64_MAGIC: 108,
+}
+
+FILE_HEADER_STRUCT = struct.Struct("<HHIIIHH")
+SECTION_HEADER_STRUCT = struct.Struct("<8sIIIIIIHHI")
+EXPORT_DIRECTORY_STRUCT = struct.Struct("<IIHHIIIIIII")
+
+class FormatError(Exception):
+    pass
+
+class Export:
+    __slots__ = ("ordinal", "name", "rva", "forwarder")
+    def __init__(self, ordinal, name, rva, forwarder):
+        self.ordinal = ordinal
+        # None for exports by ordinal only (NONAME)
+        self.name = name
+        # 0 for forwarded exports
+        self.rva = rva
+        # "DLL.Function" or "DLL.#ordinal" if the export is forwarded, otherwise None
+        self.forwarder = forwarder
+    def __repr__(self):
+        return "Export({}, {!r}, 0x{:x}, {!r})".format(self.ordinal, self.name, self.rva, self.forwarder)
+
+class Image:
+    def __init__(self, data, filename):
+        self.data = data
+        self.filename = filename
+        self.sections = []
+        if len(data) == 0:
+            self.err("file is empty")
+        if data[0:2] != IMAGE_DOS_SIGNATURE:
+            self.err("missing MZ signature")
+        pe_offset, = self.unpack("<I", 0x3c)
+        if data[pe_offset:pe_offset + 4] != IMAGE_NT_SIGNATURE:
+            self.err("missing PE signature")
+        file_header_offset = pe_offset + 4
+        _, section_count, _, _, _, optional_header_size, _ = self.unpackStruct(FILE_HEADER_STRUCT, file_header_offset)
+        optional_header_offset = file_header_offset + FILE_HEADER_STRUCT.size
+        magic, = self.unpack("<H", optional_header_offset)
+        if magic not in DATA_DIRECTORY_OFFSETS:
+            self.err("unknown optional header magic 0x{:x}".format(magic))
+        rva_count, = self.unpack("<I", optional_header_offset + RVA_COUNT_OFFSETS[magic])
+        self.export_rva, self.export_size = 0, 0
+        if rva_count > IMAGE_DIRECTORY_ENTRY_EXPORT:
+            self.export_rva, self.export_size = self.unpack("<II", optional_header_offset + DATA_DIRECTORY_OFFSETS[magic])
+        section_offset = optional_header_offset + optional_header_size
+        for i in range(section_count):
+            fields = self.unpackStruct(SECTION_HEADER_STRUCT, section_offset + i * SECTION_HEADER_STRUCT.size)
+            virtual_size, virtual_address, raw_size, raw_offset = fields[1:5]
+            self.sections.append((virtual_address, max(virtual_size, raw_size), raw_offset, raw_size))
+
+    def err(self, msg):
+        raise FormatError("{}: {}".format(self.filename, msg))
+
+    def unpack(self, fmt, offset):
+        try:
+            return struct.unpack_from(fmt, self.data, offset)
+        except struct.error:
+            self.err("truncated file reading offset 0x{:x}".format(offset))
+
+    def unpackStruct(self, st, offset):
+        try:
+            return st.unpack_from(self.data, offset)
+        except struct.error:
+            self.err("truncated file reading offset 0x{:x}".format(offset))
+
+    def rvaToOffset(self, rva):
+        for virtual_address, size, raw_offset, raw_size in self.sections:
+            if virtual_address <= rva < virtual_address + size:
+                if rva - virtual_address >= raw_size:
+                    self.err("rva 0x{:x} is not backed by file data".format(rva))
+                return raw_offset + (rva - virtual_address)
+        self.err("rva 0x{:x} is not in any section".format(rva))
+
+    def readCString(self, rva):
+        offset = self.rvaToOffset(rva)
+        end = self.data.find(b"\0", offset)
+        if end == -1:
+            self.err("unterminated string at rva 0x{:x}".format(rva))
+        try:
+            return self.data[offset:end].decode("ascii")
+        except UnicodeDecodeError:
+            self.err("string at rva 0x{:x} is not ascii".format(rva))
+
+    # returns the exports sorted by ordinal
+    def getExports(self):
+        if self.export_rva == 0:
+            return []
+        (_, _, _, _, _, ordinal_base, function_count, name_count,
+         functions_rva, names_rva, ordinals_rva) = self.unpackStruct(EXPORT_DIRECTORY_STRUCT, self.rvaToOffset(self.export_rva))
+        functions = self.unpack("<{}I".format(function_count), self.rvaToOffset(functions_rva)) if function_count else ()
+        names = {}
+        if name_count:
+            name_rvas = self.unpack("<{}I".format(name_count), self.rvaToOffset(names_rva))
+            name_ordinals = self.unpack("<{}H".format(name_count), self.rvaToOffset(ordinals_rva))
+            for name_rva, index in zip(name_rvas, name_ordinals):
+                names[index] = self.readCString(name_rva)
+        exports = []
+        for index, rva in enumerate(functions):
+            if rva == 0:
+                # unused slot in the export address table
+                continue
+            forwarder = None
+            # a function rva within the export directory points to a forwarder string
+            if self.export_rva <= rva < self.export_rva + self.export_size:
+                forwarder = self.readCString(rva)
+                rva = 0
+            exports.append(Export(ordinal_base + index, names.get(index), rva, forwarder))
+        return exports
+
+# returns the exports of the image in data sorted by ordinal, every error caused by a
+# malformed image is raised as a FormatError
+def getExports(data, filename):
+    try:
+        return Image(data, filename).getExports()
+    except (struct.error, ValueError, IndexError) as err:
+        # Image checks what it reads, this is only a safety net for anything it missed
+        raise FormatError("{}: {}".format(filename, err))
+
+# a read-only mmap of the file, mmap can't map an empty file so it's an empty bytes object then
+@contextlib.contextmanager
+def mapFile(filename):
+    with open(filename, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+def readExports(filename):
+    with mapFile(filename) as data:
+        return getExports(data, filename)
@@ -0,0 +1,171 @@
+#
+# The runtime of the python packages generated by py-gen, copied into each package
+# as _runtime.py.  A generated module only holds tables of type/function specs, every
+# ctypes object is created the first time its name is accessed (module __getattr__)
+# and then stored in the module so later accesses are plain attribute lookups.
+#
+# A type spec is a tuple:
+#     ("native", name)
+#     ("alias", name)
+#     ("singleptr", const, subtype_spec)
+#     ("arrayptr", const, subtype_spec)
+#     ("fixedlenarray", len, subtype_spec)
+#     ("funcptr", return_type_spec, ((arg_name, arg_type_spec), ...))
+#
+import sys
+import ctypes
+import importlib
+
+# stdcall on 32-bit windows, elsewhere the calling conventions are the same
+FUNCTYPE = getattr(ctypes, "WINFUNCTYPE", ctypes.CFUNCTYPE)
+# wchar_t is 16 bits on windows, other platforms use a type of the same size
+WCHAR = ctypes.c_wchar if ctypes.sizeof(ctypes.c_wchar) == 2 else ctypes.c_uint16
+
+NATIVE_TYPES = {
+    "void": None,
+    "int": ctypes.c_int,
+    "unsigned": ctypes.c_uint,
+    "uint8_t": ctypes.c_uint8,
+    "uint16_t": ctypes.c_uint16,
+    "uint32_t": ctypes.c_uint32,
+    "uint64_t": ctypes.c_uint64,
+    "size_t": ctypes.c_size_t,
+    "int8_t": ctypes.c_int8,
+    "int16_t": ctypes.c_int16,
+    "int32_t": ctypes.c_int32,
+    "int64_t": ctypes.c_int64,
+    "ssize_t": ctypes.c_ssize_t,
+    "char": ctypes.c_char,
+    "wchar_t": WCHAR,
+}
+
+# searched in order for functions whose dll is unknown
+DEFAULT_DLLS = ("kernel32", "user32", "gdi32", "advapi32", "shell32", "ole32", "oleaut32", "shlwapi", "ntdll")
+
+LIBRARIES = {}
+
+def loadLibrary(dll):
+    library = LIBRARIES.get(dll)
+    if library is None:
+        library = LIBRARIES[dll] = getattr(ctypes, "WinDLL", ctypes.CDLL)(dll)
+    return library
+
+class Function:
+    __slots__ = ("name", "prototype", "dlls", "func")
+    def __init__(self, name, prototype, dlls):
+        self.name = name
+        self.prototype = prototype
+        self.dlls = dlls
+        # the foreign function, only looked up on the first call
+        self.func = None
+
+    @property
+    def argtypes(self):
+        return self.prototype._argtypes_
+    @property
+    def restype(self):
+        return self.prototype._restype_
+
+    def __call__(self, *args):
+        func = self.func
+        if func is None:
+            func = self.func = self.load()
+        return func(*args)
+
+    def load(self):
+        errors = []
+        for dll in self.dlls:
+            try:
+                return self.prototype((self.name, loadLibrary(dll)))
+            except (OSError, AttributeError) as err:
+                errors.append(str(err))
+        raise OSError("cannot load function '{}' from {} ({})".format(self.name, ", ".join(self.dlls), "; ".join(errors)))
+
+    def __repr__(self):
+        return "<Function {}>".format(self.name)
+
+class Namespace:
+    def __init__(self, module_name, externals, typedefs, structs, constants, functions, unicode_names):
+        self.module = sys.modules[module_name]
+        self.package = module_name.rpartition(".")[0]
+        # name -> the sibling module that defines it
+        self.externals = externals
+        self.typedefs = typedefs
+        self.structs = structs
+        self.constants = constants
+        # name -> (dlls that export it, return type spec, ((arg name, arg type spec), ...))
+        self.functions = functions
+        self.unicode_names = unicode_names
+
+    def getAttr(self, name):
+        value = self.create(name)
+        setattr(self.module, name, value)
+        return value
+
+    def dir(self):
+        return sorted(set(self.module.__dict__) | set(self.typedefs) | set(self.structs) |
+                      set(self.constants) | set(self.functions) | set(self.unicode_names))
+
+    def create(self, name):
+        if name in self.structs:
+            return self.createStruct(name)
+        spec = self.typedefs.get(name)
+        if spec is not None:
+            return self.getType(spec)
+        if name in self.functions:
+            return self.createFunction(name)
+        if name in self.constants:
+            value = self.constants[name]
+            # a named value refers to another constant
+            return getattr(self.module, value) if isinstance(value, str) else value
+        if name in self.unicode_names:
+            # python strings are unicode so @unicode names always refer to their W variant
+            for suffix in ("W", "A"):
+                if name + suffix in self.module.__dict__ or self.isDefined(name + suffix):
+                    return getattr(self.module, name + suffix)
+        module_name = self.externals.get(name)
+        if module_name is not None:
+            return getattr(importlib.import_module("." + module_name, self.package), name)
+        raise AttributeError("module '{}' has no attribute '{}'".format(self.module.__name__, name))
+
+    def isDefined(self, name):
+        return name in self.structs or name in self.typedefs or name in self.functions or name in self.externals
+
+    def createStruct(self, name):
+        struct = type(name, (ctypes.Structure,), {"__module__":self.module.__name__})
+        # stored before its fields are created so fields can point back to the struct
+        setattr(self.module, name, struct)
+        try:
+            struct._fields_ = [(field_name, self.getType(field_type)) for field_name, field_type in self.structs[name]]
+        except:
+            delattr(self.module, name)
+            raise
+        return struct
+
+    def createFunction(self, name):
+        dlls, return_type, args = self.functions[name]
+        prototype = FUNCTYPE(self.getType(return_type), *[self.getType(arg_type) for _, arg_type in args])
+        return Function(name, prototype, dlls or DEFAULT_DLLS)
+
+    def getType(self, spec):
+        kind = spec[0]
+        if kind == "native":
+            return NATIVE_TYPES[spec[1]]
+        if kind == "alias":
+            return getattr(self.module, spec[1])
+        if kind == "singleptr" or kind == "arrayptr":
+            subtype = self.getType(spec[2])
+            if subtype is None:
+                return ctypes.c_void_p
+            if kind == "arrayptr":
+                # strings
+                if subtype is ctypes.c_char:
+                    return ctypes.c_char_p
+                if subtype is ctypes.c_wchar:
+                    return ctypes.c_wchar_p
+            return ctypes.POINTER(subtype)
+        if kind == "fixedlenarray":
+            return self.getType(spec[2]) * spec[1]
+        if kind == "funcptr":
+            return FUNCTYPE(self.getType(spec[1]), *[self.getType(arg_type) for _, arg_type in spec[2]])
+        raise Exception("unhandled type kind '{}'".format(kind))
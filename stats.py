@@ -0,0 +1,175 @@
+#
+# Phase timings and counters for the generators (--stats), and the cProfile wrapper
+# behind --profile.  The functions that do the work take an optional Stats object and
+# only record into it when one is given, so a run without --stats does no extra work.
+#
+import io
+import sys
+import json
+import time
+import cProfile
+import pstats
+import contextlib
+
+# number of files and functions shown by the --stats table and --profile
+TOP_COUNT = 10
+PROFILE_COUNT = 25
+
+# accumulates the time spent in the functions/iterators it wraps, used for phases that
+# are interleaved with others (i.e. the parser pulls tokens from the lexer as it goes)
+class Accumulator:
+    def __init__(self):
+        self.seconds = 0
+        self.calls = 0
+
+    def wrap(self, func):
+        perf_counter = time.perf_counter
+        def timed(*args):
+            start = perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.seconds += perf_counter() - start
+                self.calls += 1
+        return timed
+
+    # yields the items of iterable, calls counts the items
+    def iterate(self, iterable):
+        next_item = self.wrap(iter(iterable).__next__)
+        while True:
+            try:
+                item = next_item()
+            except StopIteration:
+                self.calls -= 1
+                return
+            yield item
+
+class Stats:
+    def __init__(self):
+        # phase -> seconds, in the order the phases first ran
+        self.phases = {}
+        # name -> count, names ending in "bytes" are shown as sizes
+        self.counters = {}
+        # filename -> {phase: seconds}
+        self.files = {}
+
+    def addTime(self, phase, seconds, filename=None):
+        self.phases[phase] = self.phases.get(phase, 0) + seconds
+        if filename is not None:
+            file_phases = self.files.setdefault(filename, {})
+            file_phases[phase] = file_phases.get(phase, 0) + seconds
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    # returns an Accumulator for a phase that is interleaved with others
+    def accumulator(self):
+        return Accumulator()
+
+    # returns an Accumulator of the time spent lexing, calls counts the tokens.  Done by
+    # replacing lexToken on the instance so lexers created without stats aren't slowed down.
+    def instrumentLexer(self, lexer):
+        accumulator = Accumulator()
+        lexer.lexToken = accumulator.wrap(lexer.lexToken)
+        return accumulator
+
+    @contextlib.contextmanager
+    def timer(self, phase, filename=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addTime(phase, time.perf_counter() - start, filename)
+
+    def toJsonData(self):
+        return {"phases":self.phases,"counters":self.counters,"files":self.files}
+
+    # adds the json data of another Stats (i.e. from a worker process)
+    def merge(self, jsondata):
+        for phase, seconds in jsondata["phases"].items():
+            self.addTime(phase, seconds)
+        for name, amount in jsondata["counters"].items():
+            self.count(name, amount)
+        for filename, file_phases in jsondata["files"].items():
+            for phase, seconds in file_phases.items():
+                mine = self.files.setdefault(filename, {})
+                mine[phase] = mine.get(phase, 0) + seconds
+
+# returns stats.timer(phase, filename), or a context that does nothing if stats is None
+def timer(stats, phase, filename=None):
+    if stats is None:
+        return contextlib.nullcontext()
+    return stats.timer(phase, filename)
+
+# calls func(*args, stats=Stats()) and returns its result with the json data of the stats,
+# use functools.partial(callWithStats, func) to collect stats from a process pool
+def callWithStats(func, *args):
+    stats = Stats()
+    return func(*args, stats=stats), stats.toJsonData()
+
+def formatCount(name, amount):
+    if name.endswith("bytes"):
+        return "{:.1f} MiB".format(amount / (1024 * 1024)) if amount >= 1024 * 1024 else "{:.1f} KiB".format(amount / 1024)
+    return str(amount)
+
+# the phases of worker processes add up their cpu time, so the phases can add up to more
+# than the wall time of the run and their shares are of the sum of the phases
+def writeTable(out_file, stats, total_seconds):
+    phase_seconds = sum(stats.phases.values())
+    out_file.write("phase          cpu seconds       %\n")
+    for phase, seconds in stats.phases.items():
+        out_file.write("{:<16} {:>9.3f} {:>7.1f}\n".format(phase, seconds, seconds * 100 / phase_seconds if phase_seconds else 0))
+    out_file.write("{:<16} {:>9.3f}\n".format("wall time", total_seconds))
+    if stats.counters:
+        out_file.write("\n")
+        for name, amount in stats.counters.items():
+            out_file.write("{:<16} {:>12}\n".format(name, formatCount(name, amount)))
+    if stats.files:
+        file_totals = sorted(((sum(file_phases.values()), filename) for filename, file_phases in stats.files.items()), reverse=True)
+        out_file.write("\nslowest files:\n")
+        for seconds, filename in file_totals[:TOP_COUNT]:
+            out_file.write("{:>9.3f} {}\n".format(seconds, filename))
+
+def addArguments(cmd_parser):
+    cmd_parser.add_argument("--stats", nargs="?", const="table", choices=("table", "json"),
+                            help="print the time taken by each phase and counters of the work done, as a table (default) "
+                            "or json, the table goes to stdout and the json to stderr unless --stats-file is given")
+    cmd_parser.add_argument("--stats-file", metavar="FILE", help="write the --stats output to FILE instead")
+    cmd_parser.add_argument("--profile", action="store_true",
+                            help="run under cProfile and print the {} functions with the most cumulative time".format(PROFILE_COUNT))
+
+class Run:
+    def __init__(self, args):
+        self.format = args.stats
+        self.filename = args.stats_file
+        # None when --stats isn't given so nothing is recorded
+        self.stats = Stats() if args.stats else None
+        self.profiler = cProfile.Profile() if args.profile else None
+        self.start = time.perf_counter()
+        if self.profiler:
+            self.profiler.enable()
+
+    # prints the profile to stderr and the stats, the json goes to stderr (or to the stats file)
+    # so it doesn't mix with the progress output and can be parsed as is
+    def finish(self):
+        total_seconds = time.perf_counter() - self.start
+        if self.profiler:
+            self.profiler.disable()
+            text = io.StringIO()
+            pstats.Stats(self.profiler, stream=text).sort_stats("cumulative").print_stats(PROFILE_COUNT)
+            sys.stderr.write(text.getvalue())
+        if self.stats is None:
+            return
+        if self.filename is not None:
+            with open(self.filename, "w") as out_file:
+                self.write(out_file, total_seconds)
+        else:
+            self.write(sys.stderr if self.format == "json" else sys.stdout, total_seconds)
+
+    def write(self, out_file, total_seconds):
+        if self.format == "json":
+            data = self.stats.toJsonData()
+            data["total_seconds"] = total_seconds
+            out_file.write(json.dumps(data) + "\n")
+        else:
+            writeTable(out_file, self.stats, total_seconds)
@@ -5,6 +5,8 @@ class StringReader:
         self.str = str
         self.index = 0
         self.filenameForErrors = filenameForErrors
+        # offsets of every newline in str, built on the first error
+        self.newlineOffsets = None
     def atEof(self):
         return self.index == len(self.str)
     def getPosition(self):
@@ -15,8 +17,12 @@ class StringReader:
     def pop(self):
         assert(not self.atEof())
         self.index += 1
+    def getLineAndCol(self, pos):
+        if self.newlineOffsets is None:
+            self.newlineOffsets = errors.getNewlineOffsets(self.str)
+        return errors.getLineAndColFromOffsets(self.newlineOffsets, pos)
     def errorMessagePrefix(self, pos):
-        lineno, col = errors.getLineAndCol(self.str[:pos])
+        lineno, col = self.getLineAndCol(pos)
         if self.filenameForErrors:
             return "{}({}:{}) ".format(self.filenameForErrors, lineno, col)
         return "line {} col {}: ".format(lineno, col)
@@ -0,0 +1,193 @@
+#
+# A global index of the symbols defined by every header, with where each one is
+# defined and which definitions refer to each type.  json-gen builds it from the
+# parsed .api files and saves it to out/symbols.json, the generators and the
+# symbol-query tool load it or build their own from json data.
+#
+import os
+import json
+
+import parse
+import nativetypes
+
+KINDS = ("typedef", "struct", "constant", "function", "unicode")
+
+NATIVE_TYPE_MAP = {t: True for t in nativetypes.NATIVE_TYPES}
+
+class Definition:
+    __slots__ = ("name", "kind", "header", "source", "line", "col", "type_refs")
+    def __init__(self, name, kind, header, source, line, col, type_refs):
+        self.name = name
+        self.kind = kind
+        self.header = header
+        # the file the definition came from, line/col are 0 if unknown
+        self.source = source
+        self.line = line
+        self.col = col
+        # names of the non-native types the definition refers to
+        self.type_refs = type_refs
+    def location(self):
+        if self.line:
+            return "{}({}:{})".format(self.source, self.line, self.col)
+        return self.source
+    def __repr__(self):
+        return "{} {} ({})".format(self.kind, self.name, self.location())
+
+class Conflict:
+    __slots__ = ("first", "second")
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+    def __str__(self):
+        return "'{}' is defined more than once, as a {} at {} and as a {} at {}".format(
+            self.first.name, self.first.kind, self.first.location(), self.second.kind, self.second.location())
+
+def addTypeRefs(type_refs, type):
+    if isinstance(type, parse.NamedType):
+        if type.name not in NATIVE_TYPE_MAP:
+            type_refs[type.name] = True
+    elif isinstance(type, parse.FuncPtrType):
+        addTypeRefs(type_refs, type.return_type)
+        for arg in type.args:
+            addTypeRefs(type_refs, arg.type)
+    else:
+        addTypeRefs(type_refs, type.sub_type)
+
+def addJsonTypeRefs(type_refs, type):
+    kind = type["kind"]
+    if kind == "alias":
+        type_refs[type["name"]] = True
+    elif kind == "funcptr":
+        addJsonTypeRefs(type_refs, type["return_type"])
+        for arg in type["args"]:
+            addJsonTypeRefs(type_refs, arg["type"])
+    elif kind != "native":
+        addJsonTypeRefs(type_refs, type["subtype"])
+
+# returns the (name, kind, type_refs) of a definition node, or None for nodes that don't define a symbol
+def describeNode(node):
+    type_refs = {}
+    if isinstance(node, parse.TypedefNode):
+        addTypeRefs(type_refs, node.def_type)
+        return node.name, "typedef", type_refs
+    if isinstance(node, parse.StructNode):
+        for field in node.fields:
+            addTypeRefs(type_refs, field.type)
+        return node.name, "struct", type_refs
+    if isinstance(node, parse.ConstNode):
+        addTypeRefs(type_refs, node.type)
+        return node.name, "constant", type_refs
+    if isinstance(node, parse.FuncNode):
+        addTypeRefs(type_refs, node.return_type)
+        for arg in node.args:
+            addTypeRefs(type_refs, arg.type)
+        return node.name, "function", type_refs
+    if isinstance(node, parse.UnicodeNode):
+        return node.name, "unicode", type_refs
+    return None
+
+# passes nodes through while appending a (name, kind, line, col, type_refs) record for each
+# definition to records, so the symbols can be collected while the nodes are streamed elsewhere
+def recordDefinitions(nodes, reader, records):
+    for node in nodes:
+        desc = describeNode(node)
+        if desc:
+            name, kind, type_refs = desc
+            line, col = reader.getLineAndCol(node.getToken().start)
+            records.append((name, kind, line, col, list(type_refs)))
+        yield node
+
+# returns (name, kind, line, col, type_refs) records for the json data of one header
+def recordsFromJsonData(jsondata):
+    records = []
+    for info in jsondata["types"]:
+        type_refs = {}
+        if info["kind"] == "typedef":
+            addJsonTypeRefs(type_refs, info["definition"])
+        else:
+            for field in info["fields"]:
+                addJsonTypeRefs(type_refs, field["type"])
+        records.append((info["name"], info["kind"], 0, 0, list(type_refs)))
+    for info in jsondata["constants"]:
+        type_refs = {}
+        addJsonTypeRefs(type_refs, info["type"])
+        records.append((info["name"], "constant", 0, 0, list(type_refs)))
+    for info in jsondata["functions"]:
+        type_refs = {}
+        addJsonTypeRefs(type_refs, info["return_type"])
+        for arg in info["args"]:
+            addJsonTypeRefs(type_refs, arg["type"])
+        records.append((info["name"], "function", 0, 0, list(type_refs)))
+    for info in jsondata["unicode_names"]:
+        records.append((info["name"], "unicode", 0, 0, []))
+    return records
+
+class SymbolIndex:
+    def __init__(self):
+        # header name -> (source, records), the records are what gets saved
+        self.headers = {}
+        self.definitions = None
+        self.users = None
+        self.conflicts = None
+
+    def setHeader(self, header, source, records):
+        self.headers[header] = (source, records)
+        self.definitions = None
+
+    def removeHeader(self, header):
+        if self.headers.pop(header, None):
+            self.definitions = None
+
+    # (re)builds the lookup tables after headers were added or removed
+    def build(self):
+        if self.definitions is not None:
+            return
+        self.definitions = {}
+        self.users = {}
+        self.conflicts = []
+        for header in sorted(self.headers):
+            source, records = self.headers[header]
+            for name, kind, line, col, type_refs in records:
+                definition = Definition(name, kind, header, source, line, col, type_refs)
+                existing = self.definitions.get(name)
+                if existing:
+                    self.conflicts.append(Conflict(existing, definition))
+                else:
+                    self.definitions[name] = definition
+                for type_ref in type_refs:
+                    self.users.setdefault(type_ref, []).append(definition)
+
+    # returns the Definition of name or None
+    def lookup(self, name):
+        self.build()
+        return self.definitions.get(name)
+
+    # returns the definitions that refer to the given type name
+    def getUsers(self, type_name):
+        self.build()
+        return self.users.get(type_name, [])
+
+    def getConflicts(self):
+        self.build()
+        return self.conflicts
+
+    def save(self, filename):
+        tmp_filename = filename + ".tmp"
+        # dumps uses the C encoder, dump would encode it in python
+        text = json.dumps({"headers":{header: {"source":source,"definitions":records}
+                                      for header, (source, records) in sorted(self.headers.items())}})
+        with open(tmp_filename, "w") as file:
+            file.write(text)
+        os.replace(tmp_filename, filename)
+
+# the index of a json output directory is saved next to it (i.e. out/symbols.json)
+def getFilename(json_dir):
+    return os.path.join(os.path.dirname(os.path.normpath(json_dir)), "symbols.json")
+
+def load(filename):
+    with open(filename, "r") as file:
+        data = json.load(file)
+    index = SymbolIndex()
+    for header, info in data["headers"].items():
+        index.setHeader(header, info["source"], [tuple(record) for record in info["definitions"]])
+    return index
@@ -0,0 +1,100 @@
+#
+# The compact json format of json-gen --compact.  Every type expression in a file is
+# stored once in a "type_pool" list and the typedefs, fields, constants, functions and
+# resolved types refer to it by index.  Types within pool entries (pointer subtypes,
+# funcptr return and arg types) are indices of earlier entries.  The pool is the last
+# key so json-gen can add to it while it streams the sections and when it links them.
+# load() reads either format and returns the json data in the normal format, the
+# expanded types are shared so they must not be modified.
+#
+import json
+
+import typeresolve
+
+class Pool:
+    def __init__(self):
+        # canonical type key -> index
+        self.indices = {}
+        self.entries = []
+
+    # returns the pool index of a type from the json data
+    def add(self, type):
+        key = typeresolve.getTypeKey(type)
+        index = self.indices.get(key)
+        if index is None:
+            kind = type["kind"]
+            if kind == "singleptr" or kind == "arrayptr" or kind == "fixedlenarray":
+                entry = dict(type, subtype=self.add(type["subtype"]))
+            elif kind == "funcptr":
+                entry = dict(type, return_type=self.add(type["return_type"]),
+                             args=[dict(arg, type=self.add(arg["type"])) for arg in type["args"]])
+            else:
+                entry = type
+            index = self.indices[key] = len(self.entries)
+            self.entries.append(entry)
+        return index
+
+# replaces the indices within the pool entries by the types they refer to, in place
+def expandPool(entries):
+    for entry in entries:
+        kind = entry["kind"]
+        if kind == "singleptr" or kind == "arrayptr" or kind == "fixedlenarray":
+            entry["subtype"] = entries[entry["subtype"]]
+        elif kind == "funcptr":
+            entry["return_type"] = entries[entry["return_type"]]
+            for arg in entry["args"]:
+                arg["type"] = entries[arg["type"]]
+    return entries
+
+# returns a copy of an entry of a section of the json data with every type replaced by
+# convert(type), the copy has the same keys in the same order so the expanded json data
+# dumps to the same text
+def mapInfoTypes(section, info, convert):
+    if section == "types":
+        if info["kind"] == "typedef":
+            info = dict(info, definition=convert(info["definition"]))
+            if "resolved" in info:
+                info["resolved"] = convert(info["resolved"])
+            return info
+        return dict(info, fields=[dict(field, type=convert(field["type"])) for field in info["fields"]])
+    if section == "constants":
+        return dict(info, type=convert(info["type"]))
+    if section == "functions":
+        return dict(info, return_type=convert(info["return_type"]),
+                    args=[dict(arg, type=convert(arg["type"])) for arg in info["args"]])
+    return info
+
+def compactJsonData(jsondata):
+    pool = Pool()
+    result = {section: [mapInfoTypes(section, info, pool.add) for info in infos] for section, infos in jsondata.items()}
+    result["type_pool"] = pool.entries
+    return result
+
+# returns the json data in the normal format, the json data of a compact file is expanded
+# in place (and its pool removed) since it isn't needed once expanded
+def expandJsonData(jsondata):
+    if "type_pool" not in jsondata:
+        return jsondata
+    types = expandPool(jsondata.pop("type_pool"))
+    for info in jsondata["types"]:
+        if info["kind"] == "typedef":
+            info["definition"] = types[info["definition"]]
+            if "resolved" in info:
+                info["resolved"] = types[info["resolved"]]
+        else:
+            for field in info["fields"]:
+                field["type"] = types[field["type"]]
+    for info in jsondata["constants"]:
+        info["type"] = types[info["type"]]
+    for info in jsondata["functions"]:
+        info["return_type"] = types[info["return_type"]]
+        for arg in info["args"]:
+            arg["type"] = types[arg["type"]]
+    return jsondata
+
+def isCompact(jsondata):
+    return "type_pool" in jsondata
+
+# loads a json file of json-gen in either format
+def load(file):
+    return expandJsonData(json.load(file))
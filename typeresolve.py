@@ -0,0 +1,119 @@
+#
+# Interns the type expressions of the json data to canonical ids and resolves them
+# by replacing every typedef name with its definition, all the way down to native
+# types, struct names and funcptr typedef names.  Each type is only resolved once no matter how many
+# functions/fields use it.
+#
+
+# returns a hashable canonical form of a type from the json data
+def getTypeKey(type):
+    kind = type["kind"]
+    if kind == "native" or kind == "alias":
+        return type["name"]
+    if kind == "singleptr" or kind == "arrayptr":
+        return (kind, type["const"], getTypeKey(type["subtype"]))
+    if kind == "fixedlenarray":
+        return (kind, type["len"], getTypeKey(type["subtype"]))
+    if kind == "funcptr":
+        return (kind, getTypeKey(type["return_type"]), tuple((arg["name"], getTypeKey(arg["type"])) for arg in type["args"]))
+    raise Exception("unhandled type kind '{}'".format(kind))
+
+class ResolveError(Exception):
+    pass
+
+class TypeTable:
+    def __init__(self):
+        # canonical type key -> id
+        self.ids = {}
+        # id -> json data of the first type interned with that key
+        self.types = []
+
+    def intern(self, type):
+        key = getTypeKey(type)
+        id = self.ids.get(key)
+        if id is None:
+            id = self.ids[key] = len(self.types)
+            self.types.append(type)
+        return id
+
+class Resolver:
+    # definitions maps each type name to its json data (a typedef or struct entry)
+    def __init__(self, definitions, table=None):
+        self.definitions = definitions
+        self.table = table if table is not None else TypeTable()
+        # type id -> resolved type id, named types are memoized by name instead
+        self.resolved = {}
+        self.resolved_names = {}
+        # the typedef names being resolved, in order, to report cycles
+        self.resolving = []
+
+    # returns the resolved json data of a type
+    def resolve(self, type):
+        kind = type["kind"]
+        if kind == "native":
+            return type
+        if kind == "alias":
+            name = type["name"]
+            resolved = self.resolved_names.get(name)
+            if resolved is None:
+                resolved = self.resolved_names[name] = self.createNamed(name)
+            return resolved
+        return self.table.types[self.resolveId(self.table.intern(type))]
+
+    def resolveId(self, id):
+        resolved_id = self.resolved.get(id)
+        if resolved_id is None:
+            resolved_id = self.resolved[id] = self.table.intern(self.createResolved(self.table.types[id]))
+        return resolved_id
+
+    # returns the resolved json data of the definition of a typedef
+    def resolveTypedef(self, name):
+        info = self.definitions.get(name)
+        if info is None or info["kind"] != "typedef":
+            raise ResolveError("typedef '{}' is not defined".format(name))
+        return self.expandTypedef(name, info)
+
+    def expandTypedef(self, name, info):
+        if name in self.resolving:
+            cycle = self.resolving[self.resolving.index(name):] + [name]
+            raise ResolveError("typedef '{}' refers to itself ({})".format(name, " -> ".join(cycle)))
+        self.resolving.append(name)
+        try:
+            return self.resolve(info["definition"])
+        finally:
+            self.resolving.pop()
+
+    def createNamed(self, name):
+        info = self.definitions.get(name)
+        if info is None:
+            raise ResolveError("type '{}' is not defined".format(name))
+        # structs and funcptr typedefs are resolved to themselves, expanding a funcptr
+        # within another type would copy its whole signature (and the signatures of
+        # the funcptr types it uses) into every type that refers to it
+        if info["kind"] != "typedef" or info["definition"]["kind"] == "funcptr":
+            return {"kind":"alias","name":name}
+        return self.expandTypedef(name, info)
+
+    def createResolved(self, type):
+        kind = type["kind"]
+        if kind == "singleptr" or kind == "arrayptr":
+            return {"kind":kind,"const":type["const"],"subtype":self.resolve(type["subtype"])}
+        if kind == "fixedlenarray":
+            return {"kind":kind,"len":type["len"],"subtype":self.resolve(type["subtype"])}
+        return {"kind":kind,"return_type":self.resolve(type["return_type"]),"args":[
+            {"name":arg["name"],"type":self.resolve(arg["type"])} for arg in type["args"]]}
+
+# returns ({typedef name: resolved json data}, errors) for every typedef in definitions,
+# errors is a list of (name, message) for the typedefs that can't be resolved
+def resolveTypedefs(definitions):
+    resolver = Resolver(definitions)
+    resolved = {}
+    errors = []
+    for name, info in definitions.items():
+        if info["kind"] != "typedef":
+            continue
+        try:
+            resolved[name] = resolver.resolveTypedef(name)
+        except ResolveError as err:
+            errors.append((name, "cannot resolve typedef '{}': {}".format(name, err)))
+    return resolved, errors
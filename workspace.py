@@ -0,0 +1,186 @@
+#
+# The in-memory state of api-daemon: the json data of every .api file, the symbol index
+# and the C headers, kept up to date by update() which only re-parses the .api files
+# that changed and only rewrites the outputs whose content changed.  The outputs and
+# manifests are the same as json-gen + c-header-gen (or gen) would write, so the tools
+# can be run incrementally on them.
+#
+import os
+import sys
+import json
+import time
+import shutil
+
+import lex
+import apijson
+import manifest
+import symbols
+import cheader
+
+class Source:
+    def __init__(self, filename, header):
+        self.filename = filename
+        self.header = header
+        # (mtime_ns, size) of the .api file when it was last read
+        self.stat_key = None
+        self.hash = None
+        self.records = None
+        self.json_text = None
+        self.json_hash = None
+        # (json_hash, imports, exports hashes of the imports) the header was rendered from
+        self.header_key = None
+        self.header_text = None
+
+class Workspace:
+    def __init__(self, api_dir, json_dir, c_dir, lexer_class):
+        self.api_dir = api_dir
+        self.json_dir = json_dir
+        self.c_dir = c_dir
+        self.lexer_class = lexer_class
+        # .api filename -> Source, only files that parsed at least once have one
+        self.sources = {}
+        # .api filename -> (stat_key, message) of files that currently don't parse
+        self.errors = {}
+        self.symbol_index = symbols.SymbolIndex()
+        self.warnings = []
+
+    # removes any previous outputs, the first update writes them all
+    def reset(self):
+        for path in (self.json_dir, self.c_dir):
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.makedirs(path)
+
+    def getStatus(self):
+        return {"files":len(self.sources),"errors":[message for _, message in self.errors.values()],"warnings":self.warnings}
+
+    # returns the .api files that changed since the last update and the ones that were removed
+    def scan(self):
+        filenames = [os.path.join(self.api_dir, entry_basename)
+                     for entry_basename in sorted(os.listdir(self.api_dir)) if entry_basename.endswith(".api")]
+        changed = []
+        for filename in filenames:
+            stat = os.stat(filename)
+            stat_key = (stat.st_mtime_ns, stat.st_size)
+            source = self.sources.get(filename)
+            error = self.errors.get(filename)
+            if error is not None and error[0] == stat_key:
+                continue
+            if error is None and source is not None and source.stat_key == stat_key:
+                continue
+            changed.append((filename, stat_key))
+        names = {filename: True for filename in filenames}
+        removed = [filename for filename in self.sources if filename not in names]
+        for filename in list(self.errors):
+            if filename not in names:
+                del self.errors[filename]
+        return changed, removed
+
+    # brings the outputs up to date with the .api files, returns what was done
+    def update(self):
+        start = time.perf_counter()
+        result = {"parsed":[],"removed":[],"generated":[],"errors":[]}
+        changed, removed = self.scan()
+        parsed = []
+        for filename, stat_key in changed:
+            source = self.sources.get(filename)
+            hash = manifest.hashFile(filename)
+            if source is not None and source.hash == hash and filename not in self.errors:
+                # touched but not modified
+                source.stat_key = stat_key
+                continue
+            try:
+                jsondata, records = apijson.parseFile(filename, self.lexer_class)
+            except lex.SyntaxError as err:
+                self.errors[filename] = (stat_key, str(err))
+                result["errors"].append(str(err))
+                continue
+            self.errors.pop(filename, None)
+            if source is None:
+                json_filename = apijson.getOutFilename(self.json_dir, filename)
+                name = os.path.basename(json_filename)[:-5]
+                source = self.sources[filename] = Source(filename, cheader.Header(
+                    name, json_filename, os.path.join(self.c_dir, name + ".h"), jsondata, None, None))
+            source.stat_key = stat_key
+            source.hash = hash
+            source.records = records
+            source.header.jsondata = jsondata
+            self.symbol_index.setHeader(source.header.name, filename, records)
+            parsed.append(source)
+            result["parsed"].append(filename)
+        for filename in removed:
+            source = self.sources.pop(filename)
+            self.symbol_index.removeHeader(source.header.name)
+            for stale_filename in (source.header.json_filename, source.header.header_filename):
+                if os.path.exists(stale_filename):
+                    os.remove(stale_filename)
+            result["removed"].append(filename)
+        if parsed or removed:
+            self.regenerate(parsed, result)
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def regenerate(self, parsed, result):
+        sources = [self.sources[filename] for filename in sorted(self.sources)]
+        # layouts and resolved types depend on every header, only the json data they change is rewritten
+        modified = []
+        link_errors = apijson.linkJsonData([source.header.jsondata for source in sources], modified)
+        self.warnings = []
+        for name, message in link_errors:
+            definition = self.symbol_index.lookup(name)
+            self.warnings.append("{}: warning: {}".format(definition.location() if definition else self.api_dir, message))
+        dirty = {id(source.header.jsondata): True for source in parsed}
+        dirty.update((id(jsondata), True) for jsondata in modified)
+        for source in sources:
+            header = source.header
+            if id(header.jsondata) not in dirty:
+                continue
+            text = json.dumps(header.jsondata)
+            if text == source.json_text:
+                continue
+            print("generating: {}".format(header.json_filename))
+            with open(header.json_filename, "w") as file:
+                file.write(text)
+            source.json_text = text
+            source.json_hash = manifest.hashBytes(text.encode("utf8"))
+            header.type_refs, header.type_exports = cheader.analyzeJsonData(header.jsondata)
+            result["generated"].append(header.json_filename)
+        self.symbol_index.save(symbols.getFilename(self.json_dir))
+        manifest.save(manifest.getFilename(self.json_dir), {"generator_version":apijson.getGeneratorVersion(),"files":{
+            os.path.basename(source.filename): {"hash":source.hash,"output":source.header.name + ".json"} for source in sources}})
+
+        headers = [source.header for source in sources]
+        for header in headers:
+            header.imports = {}
+        # cheader exits on errors that c-header-gen can't recover from, here they are only reported
+        try:
+            type_index = cheader.buildTypeIndex(headers)
+            conflicts = type_index.getConflicts()
+            if conflicts:
+                cheader.exitWithConflicts(conflicts, self.symbol_index)
+            cheader.resolveImports(headers, type_index)
+        except SystemExit as err:
+            result["errors"].append(str(err.code))
+            return
+        exports_hashes = {header.name: cheader.hashTypeExports(header.type_exports) for header in headers}
+        for source in sources:
+            header = source.header
+            imports = [i.name for i in header.imports]
+            header_key = (source.json_hash, imports, [exports_hashes[name] for name in imports])
+            if header_key == source.header_key:
+                continue
+            try:
+                text = cheader.renderHeader(header)
+            except SystemExit as err:
+                result["errors"].append(str(err.code))
+                continue
+            source.header_key = header_key
+            if text == source.header_text:
+                continue
+            print("generating: {}".format(header.header_filename))
+            cheader.writeHeader(header, text)
+            source.header_text = text
+            result["generated"].append(header.header_filename)
+        manifest.save(manifest.getFilename(self.c_dir), cheader.getManifest(cheader.getGeneratorVersion(), headers,
+            {source.header.name: source.json_hash for source in sources}, exports_hashes))
+        sys.stdout.flush()